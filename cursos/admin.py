@@ -1,9 +1,13 @@
 from django.contrib import admin
-from .models import Category, Course, Module, Lesson, Enrollment, LessonProgress, Review
+from .admin_utils import AutocompleteFilter, AutocompleteFilterMixin, EstimatedCountPaginator
+from .models import (
+    Category, Course, Module, Lesson, Enrollment, LessonProgress, Review, CourseRating,
+    CourseDailyStats, InstructorDailyStats,
+)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug', 'is_active', 'created_at')
+    list_display = ('name', 'slug', 'is_active', 'published_courses_count', 'created_at')
     list_filter = ('is_active', 'created_at')
     search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
@@ -21,6 +25,8 @@ class CourseAdmin(admin.ModelAdmin):
     list_display = ('title', 'instructor', 'category', 'price', 'difficulty', 'status', 'is_featured', 'created_at')
     list_filter = ('category', 'difficulty', 'status', 'is_featured', 'created_at')
     search_fields = ('title', 'instructor__first_name', 'instructor__last_name')
+    list_select_related = ('instructor', 'category')
+    autocomplete_fields = ('instructor', 'category')
     prepopulated_fields = {'slug': ('title',)}
     inlines = [ModuleInline]
     
@@ -43,33 +49,82 @@ class CourseAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Module)
-class ModuleAdmin(admin.ModelAdmin):
+class ModuleAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('title', 'course', 'order', 'is_free')
-    list_filter = ('course', 'is_free')
+    list_filter = (('course', AutocompleteFilter), 'is_free')
     search_fields = ('title', 'course__title')
+    autocomplete_fields = ('course',)
     inlines = [LessonInline]
+    
+    def get_queryset(self, request):
+        # También lo usa la vista de autocompletado, que muestra str(obj)
+        return super().get_queryset(request).select_related('course')
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('title', 'module', 'lesson_type', 'duration_minutes', 'order', 'is_free')
-    list_filter = ('lesson_type', 'is_free', 'module__course')
+    list_filter = ('lesson_type', 'is_free', ('module__course', AutocompleteFilter))
     search_fields = ('title', 'module__title')
+    autocomplete_fields = ('module',)
+    
+    def get_queryset(self, request):
+        # También lo usa la vista de autocompletado, que muestra str(obj)
+        return super().get_queryset(request).select_related('module__course')
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('student', 'course', 'progress', 'enrolled_at', 'completed_at')
-    list_filter = ('enrolled_at', 'completed_at', 'course')
+    list_filter = ('enrolled_at', 'completed_at', ('course', AutocompleteFilter), ('student', AutocompleteFilter))
     search_fields = ('student__first_name', 'student__last_name', 'course__title')
     readonly_fields = ('enrolled_at',)
+    autocomplete_fields = ('student', 'course')
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        # También lo usa la vista de autocompletado, que muestra str(obj)
+        return super().get_queryset(request).select_related('student', 'course')
 
 @admin.register(LessonProgress)
-class LessonProgressAdmin(admin.ModelAdmin):
+class LessonProgressAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('enrollment', 'lesson', 'completed', 'completed_at')
-    list_filter = ('completed', 'completed_at')
+    list_filter = ('completed', 'completed_at', ('enrollment__course', AutocompleteFilter))
     search_fields = ('enrollment__student__first_name', 'enrollment__student__last_name', 'lesson__title')
+    list_select_related = ('enrollment__student', 'enrollment__course', 'lesson__module')
+    autocomplete_fields = ('enrollment', 'lesson')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('course', 'student', 'rating', 'created_at')
-    list_filter = ('rating', 'created_at', 'course')
+    list_filter = ('rating', 'created_at', ('course', AutocompleteFilter))
     search_fields = ('course__title', 'student__first_name', 'student__last_name')
+    list_select_related = ('course', 'student')
+    autocomplete_fields = ('course', 'student')
+    show_full_result_count = False
+
+@admin.register(CourseRating)
+class CourseRatingAdmin(admin.ModelAdmin):
+    list_display = ('course', 'average', 'review_count', 'stars_5', 'stars_4', 'stars_3', 'stars_2', 'stars_1', 'updated_at')
+    readonly_fields = ('review_count', 'rating_total', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5', 'updated_at')
+    search_fields = ('course__title',)
+    list_select_related = ('course',)
+    autocomplete_fields = ('course',)
+
+@admin.register(CourseDailyStats)
+class CourseDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'course', 'revenue', 'orders', 'enrollments', 'completions', 'refunds')
+    list_filter = ('day',)
+    search_fields = ('course__title',)
+    list_select_related = ('course',)
+    date_hierarchy = 'day'
+
+@admin.register(InstructorDailyStats)
+class InstructorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'instructor', 'revenue', 'orders', 'enrollments', 'completions', 'refunds')
+    list_filter = ('day',)
+    search_fields = ('instructor__first_name', 'instructor__last_name', 'instructor__email')
+    list_select_related = ('instructor',)
+    date_hierarchy = 'day'
@@ -0,0 +1,120 @@
+"""
+Utilidades para listados del admin sobre tablas grandes.
+
+AutocompleteFilter sustituye al filtro de relaciones de Django, que carga
+todos los objetos relacionados en la barra lateral, por un select con
+búsqueda (la misma vista de autocompletado que usan autocomplete_fields).
+EstimatedCountPaginator evita el COUNT(*) exacto de los listados sin filtros
+cuando la tabla es enorme y el motor ofrece una estimación.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+# A partir de este número de filas estimadas no se hace el COUNT exacto
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000)
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filtro por clave foránea con autocompletado.
+
+    Uso: list_filter = (('course', AutocompleteFilter),). El admin del modelo
+    relacionado debe definir search_fields y el ModelAdmin que lo usa debe
+    incluir AutocompleteFilterMixin para cargar select2.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        self.source_model = field.model
+        self.field_name = field.name
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = getattr(field, 'verbose_name', field_path)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    @cached_property
+    def selected(self):
+        # Solo se carga el objeto elegido, no la tabla completa
+        if not self.lookup_val:
+            return None
+        try:
+            return self.field.remote_field.model._default_manager.filter(pk=self.lookup_val).first()
+        except (ValueError, ValidationError):
+            return None
+
+    def choices(self, changelist):
+        self.base_query_string = changelist.get_query_string(remove=[self.lookup_kwarg])
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': self.base_query_string,
+            'display': 'Todos',
+        }
+
+    @property
+    def widget_attrs(self):
+        return {
+            'app_label': self.source_model._meta.app_label,
+            'model_name': self.source_model._meta.model_name,
+            'field_name': self.field_name,
+        }
+
+
+class AutocompleteFilterMixin:
+    """
+    Añade al ModelAdmin los estáticos de select2 que necesita AutocompleteFilter
+    """
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Filas aproximadas de la tabla según las estadísticas del motor, o None
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                # sqlite_stat1 solo existe tras ejecutar ANALYZE
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador que, sin filtros, usa la estimación del motor en tablas grandes.
+
+    Pensado para ModelAdmin con show_full_result_count = False. Con filtros o
+    búsqueda el total sigue siendo exacto.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
@@ -5,3 +5,11 @@ class CursosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cursos'
     verbose_name = 'Cursos'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+        from .progress import check_progress_batching
+
+        check_progress_batching()
+        post_migrate.connect(signals.ensure_search_index, sender=self)
@@ -0,0 +1,249 @@
+"""
+Banco de pruebas de latencia de los recorridos principales.
+
+Se ejecuta con `benchmark_journeys` sobre una base de datos de pruebas
+nueva (nunca la real) y una caché en memoria. Cada recorrido hace peticiones
+con el cliente de pruebas de Django, que atraviesa middleware, vistas y
+plantillas, y se mide la latencia, el rendimiento y las consultas SQL por
+petición. Los resultados se pueden guardar como referencia y comparar en
+ejecuciones posteriores para detectar regresiones.
+"""
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import Client
+from django.urls import reverse
+
+from cursosmarlon.middleware import QueryRecorder
+from .models import Category, Course, Enrollment, Lesson, Module
+from .pagination import encode_cursor
+
+User = get_user_model()
+
+# Recorridos en el orden en que se informan
+JOURNEYS = (
+    'home', 'course_list', 'course_list_filtered', 'course_list_search', 'course_list_deep',
+    'course_detail', 'course_player', 'my_courses', 'add_to_cart', 'checkout', 'confirm_payment',
+)
+DIFFICULTIES = ('beginner', 'intermediate', 'advanced')
+WORDS = ('django', 'python', 'datos', 'diseño', 'redes', 'seguridad', 'nube', 'móvil', 'gestión', 'análisis')
+
+
+def seed_benchmark_data(scale=1, seed=42, buyers=100):
+    """
+    Datos de prueba deterministas: scale multiplica cursos y estudiantes.
+    Los compradores no tienen inscripciones para poder comprar cualquier curso.
+    """
+    from .counters import rebuild_category_counters
+    from .search import rebuild_search_index
+
+    rng = random.Random(seed)
+    password = make_password('benchmark')
+    categories = Category.objects.bulk_create([
+        Category(name=f'Categoría {i}', slug=f'categoria-{i}', description='Categoría de prueba', is_active=True)
+        for i in range(8)
+    ])
+    instructors = User.objects.bulk_create([
+        User(username=f'instructor{i}', email=f'instructor{i}@bench.local', first_name='Instructor', last_name=str(i),
+             password=password, is_instructor=True)
+        for i in range(10 * scale)
+    ])
+    courses = Course.objects.bulk_create([
+        Course(
+            title=f'Curso de {rng.choice(WORDS)} {i}', slug=f'curso-{i}', short_description='Descripción corta',
+            description=' '.join(rng.choices(WORDS, k=40)), category=rng.choice(categories),
+            instructor=rng.choice(instructors), thumbnail='courses/thumbnails/bench.png',
+            price=Decimal(rng.choice((10, 20, 50, 90))), difficulty=rng.choice(DIFFICULTIES), status='published',
+            duration_hours=rng.randint(1, 40), requirements='Ninguno', what_you_learn=' '.join(rng.choices(WORDS, k=8)),
+            is_featured=i % 10 == 0,
+        )
+        for i in range(200 * scale)
+    ], batch_size=1000)
+    modules = Module.objects.bulk_create(
+        [Module(course=course, title=f'Módulo {m}', order=m) for course in courses for m in range(5)],
+        batch_size=1000,
+    )
+    Lesson.objects.bulk_create(
+        [Lesson(module=module, title=f'Lección {n}', order=n, duration_minutes=10) for module in modules for n in range(4)],
+        batch_size=2000,
+    )
+    students = User.objects.bulk_create([
+        User(username=f'student{i}', email=f'student{i}@bench.local', first_name='Estudiante', last_name=str(i),
+             password=password)
+        for i in range(500 * scale)
+    ], batch_size=1000)
+    Enrollment.objects.bulk_create(
+        [Enrollment(student=student, course=course) for student in students for course in rng.sample(courses, 3)],
+        batch_size=2000,
+    )
+    User.objects.bulk_create([
+        User(username=f'buyer{i}', email=f'buyer{i}@bench.local', first_name='Comprador', last_name=str(i),
+             password=password)
+        for i in range(buyers)
+    ], batch_size=1000)
+    # bulk_create no envía señales: reconstruir lo que mantienen
+    rebuild_category_counters()
+    rebuild_search_index()
+
+
+class _FakeIntent(dict):
+    """
+    Payment Intent pagado, en lugar de consultar a Stripe
+    """
+
+    def __init__(self, intent_id):
+        super().__init__(id=intent_id, metadata={})
+        self.id = intent_id
+        self.status = 'succeeded'
+
+
+def fake_retrieve_intent(intent_id, **kwargs):
+    return _FakeIntent(intent_id)
+
+
+class JourneyStats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+        self.first_error = None
+
+    def record(self, response, elapsed, queries):
+        self.latencies.append(elapsed)
+        self.queries.append(queries)
+        if response.status_code >= 400:
+            self.errors += 1
+            if self.first_error is None:
+                exc_info = getattr(response, 'exc_info', None)
+                self.first_error = f'{response.status_code} {exc_info[1]!r}' if exc_info else str(response.status_code)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        total = sum(latencies)
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'first_error': self.first_error,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'throughput_rps': len(latencies) / total if total else 0,
+            'queries_mean': sum(self.queries) / len(self.queries) if self.queries else 0,
+            'queries_max': max(self.queries, default=0),
+        }
+
+
+def percentile(sorted_values, pct):
+    """
+    Percentil por rango más cercano de una lista ya ordenada
+    """
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class JourneyRunner:
+    """
+    Ejecuta los recorridos contra los datos sembrados
+    """
+
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+        self.stats = {name: JourneyStats(name) for name in JOURNEYS}
+        self.anonymous = Client(raise_request_exception=False)
+        self.student = User.objects.filter(enrollments__isnull=False, is_instructor=False).order_by('pk').first()
+        self.student_client = Client(raise_request_exception=False)
+        self.student_client.force_login(self.student)
+        self.enrolled_slugs = list(
+            Course.objects.filter(enrollments__student=self.student).values_list('slug', flat=True)
+        )
+        courses = list(Course.objects.filter(status='published').order_by('-created_at', '-id'))
+        self.courses = courses
+        self.category_slugs = list(Category.objects.values_list('slug', flat=True))
+        self.buyers = list(User.objects.filter(enrollments__isnull=True, is_instructor=False).order_by('pk'))
+        # Página profunda: el 90 % del catálogo, por cursor o por número de página
+        deep = min(len(courses) - 1, len(courses) * 9 // 10)
+        self.deep_query = {'cursor': encode_cursor(courses[deep], 'next'), 'page': deep // 12 + 1}
+        self._next_buyer = 0
+
+    def reset_stats(self):
+        """
+        Descarta lo medido hasta ahora (por ejemplo, tras el calentamiento)
+        """
+        self.stats = {name: JourneyStats(name) for name in JOURNEYS}
+
+    def _measure(self, journey, client, method, path, **kwargs):
+        with QueryRecorder() as recorder:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            elapsed = time.perf_counter() - started
+        self.stats[journey].record(response, elapsed, recorder.count)
+        return response
+
+    def run_browsing(self, requests):
+        course_list = reverse('course_list')
+        deep_param = 'cursor' if settings.CATALOG_PAGINATION == 'keyset' else 'page'
+        for _ in range(requests):
+            course = self.rng.choice(self.courses)
+            self._measure('home', self.anonymous, 'get', reverse('home'))
+            self._measure('course_list', self.anonymous, 'get', course_list)
+            self._measure('course_list_filtered', self.anonymous, 'get', course_list, data={
+                'category': self.rng.choice(self.category_slugs), 'difficulty': self.rng.choice(DIFFICULTIES),
+            })
+            self._measure('course_list_search', self.anonymous, 'get', course_list, data={'search': self.rng.choice(WORDS)})
+            self._measure('course_list_deep', self.anonymous, 'get', course_list, data={deep_param: self.deep_query[deep_param]})
+            self._measure('course_detail', self.student_client, 'get', reverse('course_detail', args=[course.slug]))
+            self._measure('course_player', self.student_client, 'get',
+                          reverse('course_player', args=[self.rng.choice(self.enrolled_slugs)]))
+            self._measure('my_courses', self.student_client, 'get', reverse('my_courses'))
+
+    def run_purchases(self, requests):
+        """
+        Carrito, checkout y confirmación del pago (Stripe simulado), un comprador por compra
+        """
+        from unittest import mock
+        from payments.models import Order
+
+        with mock.patch('payments.fulfillment.stripe.PaymentIntent.retrieve', side_effect=fake_retrieve_intent):
+            buyers = self.buyers[self._next_buyer:self._next_buyer + requests]
+            self._next_buyer += len(buyers)
+            for buyer in buyers:
+                client = Client(raise_request_exception=False)
+                client.force_login(buyer)
+                course = self.rng.choice(self.courses)
+                self._measure('add_to_cart', client, 'post', reverse('add_to_cart'),
+                              data=json.dumps({'course_id': course.pk}), content_type='application/json')
+                self._measure('checkout', client, 'get', reverse('checkout'))
+                order_id = Order.objects.filter(user=buyer, status='pending').values_list('pk', flat=True).first()
+                self._measure('confirm_payment', client, 'post', reverse('confirm_payment'),
+                              data=json.dumps({'order_id': order_id, 'payment_intent_id': f'pi_bench_{buyer.pk}'}),
+                              content_type='application/json')
+
+    def results(self):
+        return {name: stats.summary() for name, stats in self.stats.items() if stats.latencies}
+
+
+def compare_with_baseline(results, baseline, latency_tolerance=0.2, query_tolerance=0):
+    """
+    Regresiones frente a una referencia: p95 más lento que la tolerancia
+    o más consultas por petición que antes
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + latency_tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} → {current['p95_ms']:.1f} ms")
+        if current['queries_mean'] > previous['queries_mean'] + query_tolerance:
+            regressions.append(f"{name}: consultas {previous['queries_mean']:.1f} → {current['queries_mean']:.1f}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: errores {previous['errors']} → {current['errors']}")
+    return regressions
@@ -0,0 +1,76 @@
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+# Segundos que se conservan en caché las secciones de cursos de la portada
+HOME_CACHE_TIMEOUT = getattr(settings, 'HOME_CACHE_TIMEOUT', 60 * 15)
+HOME_SECTIONS_FRAGMENT = 'home_sections'
+# Segundos que dura como mucho un bloqueo si quien lo tiene no lo libera
+CACHE_LOCK_TIMEOUT = 5
+CACHE_LOCK_POLL = 0.01
+# Backends cuyo contenido no ven los demás procesos (workers web, Celery)
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def invalidate_home_sections():
+    """
+    Descarta el fragmento cacheado de la portada
+    """
+    cache.delete(make_template_fragment_key(HOME_SECTIONS_FRAGMENT))
+
+
+def get_cache_version(namespace, object_id):
+    """
+    Versión actual de los datos cacheados de un objeto
+    """
+    return cache.get_or_set(f'{namespace}_version:{object_id}', 1, None)
+
+
+def bump_cache_version(namespace, object_id):
+    """
+    Invalida los datos cacheados de un objeto pasando a una nueva versión
+    """
+    key = f'{namespace}_version:{object_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def is_shared_cache(alias='default'):
+    """
+    Si la caché es compartida entre procesos (Redis, Memcached, base de
+    datos...) y sirve para guardar estado, no solo para acelerar lecturas
+    """
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+class CacheLockTimeout(Exception):
+    pass
+
+
+@contextmanager
+def cache_lock(key, timeout=CACHE_LOCK_TIMEOUT, using=None):
+    """
+    Bloqueo entre procesos con cache.add: solo quien crea la clave entra en
+    el bloque. Un bloqueo abandonado caduca a los timeout segundos.
+    """
+    backend = cache if using is None else using
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout * 2
+    while not backend.add(key, token, timeout):
+        if time.monotonic() > deadline:
+            raise CacheLockTimeout(f'No se pudo obtener el bloqueo {key}')
+        time.sleep(CACHE_LOCK_POLL)
+    try:
+        yield
+    finally:
+        if backend.get(key) == token:
+            backend.delete(key)
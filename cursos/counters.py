@@ -0,0 +1,31 @@
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .models import Category
+
+
+def adjust_category_counter(category_id, delta):
+    """
+    Suma (o resta) cursos publicados al contador de una categoría
+    """
+    if not category_id or not delta:
+        return
+    Category.objects.filter(pk=category_id).update(
+        published_courses_count=Greatest(F('published_courses_count') + delta, 0)
+    )
+
+
+def rebuild_category_counters():
+    """
+    Recalcula desde cero los contadores de todas las categorías
+    """
+    categories = Category.objects.annotate(
+        published=Count('courses', filter=Q(courses__status='published'))
+    ).only('pk', 'published_courses_count')
+    updated = []
+    for category in categories:
+        if category.published_courses_count != category.published:
+            category.published_courses_count = category.published
+            updated.append(category)
+    Category.objects.bulk_update(updated, ['published_courses_count'])
+    return len(updated)
@@ -0,0 +1,57 @@
+"""
+Caché de inscripciones por usuario.
+
+Guarda el conjunto de IDs de cursos en los que está inscrito cada usuario
+bajo una clave versionada; crear o borrar una inscripción publica una nueva
+versión, de modo que la siguiente lectura vuelve a cargar el conjunto.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .cache import get_cache_version, bump_cache_version
+from .models import Enrollment
+
+ENTITLEMENT_NAMESPACE = 'enrolled_courses'
+ENTITLEMENT_CACHE_TIMEOUT = getattr(settings, 'ENTITLEMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_enrolled_course_ids(user):
+    """
+    Conjunto de IDs de los cursos en los que está inscrito el usuario
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    # Memoizado en el propio usuario para no repetir la lectura en la petición
+    cached = getattr(user, '_enrolled_course_ids', None)
+    if cached is not None:
+        return cached
+    version = get_cache_version(ENTITLEMENT_NAMESPACE, user.pk)
+    key = f'{ENTITLEMENT_NAMESPACE}:{user.pk}:{version}'
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            Enrollment.objects.filter(student_id=user.pk).values_list('course_id', flat=True)
+        )
+        cache.set(key, course_ids, ENTITLEMENT_CACHE_TIMEOUT)
+    user._enrolled_course_ids = course_ids
+    return course_ids
+
+
+def is_enrolled(user, course_id):
+    return course_id in get_enrolled_course_ids(user)
+
+
+def enrolled_among(user, course_ids):
+    """
+    Cuáles de los cursos indicados pertenecen ya al usuario
+    """
+    return get_enrolled_course_ids(user).intersection(course_ids)
+
+
+def invalidate_enrollments(user_id):
+    """
+    Publica una nueva versión de las inscripciones del usuario al confirmar
+    la transacción en curso (necesario tras bulk_create o update masivos)
+    """
+    transaction.on_commit(lambda: bump_cache_version(ENTITLEMENT_NAMESPACE, user_id))
@@ -0,0 +1,196 @@
+"""
+Asesor de índices a partir de las consultas reales de cada URL.
+
+Se recorren las URLs con el cliente de pruebas, se guardan sus SELECT con
+QueryRecorder y se pasa cada una por EXPLAIN (EXPLAIN QUERY PLAN en SQLite,
+EXPLAIN en formato JSON en PostgreSQL). Un recorrido completo de una tabla
+que la consulta filtra, o una ordenación en memoria, se traduce en un índice
+propuesto: primero las columnas comparadas por igualdad, después las de
+rango y por último las del ORDER BY.
+"""
+import json
+import re
+from collections import OrderedDict
+
+from django.apps import apps
+
+# "tabla"."columna" seguido del operador con el que se compara
+CONDITION_RE = re.compile(r'"(\w+)"\."(\w+)"\s*(=|IN\b|<=|>=|<|>|IS\b|LIKE\b)', re.IGNORECASE)
+ORDER_BY_RE = re.compile(r'\bORDER BY (.+?)(?:\bLIMIT\b|\bOFFSET\b|$)', re.IGNORECASE | re.DOTALL)
+ORDER_COLUMN_RE = re.compile(r'"(\w+)"\."(\w+)"( DESC)?', re.IGNORECASE)
+FROM_RE = re.compile(r'\bFROM "(\w+)"', re.IGNORECASE)
+WHERE_RE = re.compile(r'\bWHERE\b(.+?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)', re.IGNORECASE | re.DOTALL)
+SQLITE_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+EQUALITY_OPERATORS = ('=', 'IN', 'IS')
+
+
+class Finding:
+    """
+    Problema del plan de una consulta y el índice que lo resolvería
+    """
+
+    def __init__(self, kind, table, sql, fields):
+        self.kind = kind
+        self.table = table
+        self.sql = sql
+        self.fields = fields
+
+    @property
+    def model(self):
+        return model_for_table(self.table)
+
+
+def model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def explain(connection, sql, params):
+    """
+    [(tipo, tabla)] de los problemas del plan: 'scan' (recorrido completo
+    de la tabla) o 'sort' (ordenación sin índice)
+    """
+    problems = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            for row in cursor.fetchall():
+                detail = row[-1]
+                match = SQLITE_SCAN_RE.match(detail)
+                if match:
+                    problems.append(('scan', match.group(1)))
+                elif detail.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detail:
+                    problems.append(('sort', None))
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = [plan[0]['Plan']]
+            while nodes:
+                node = nodes.pop()
+                if node['Node Type'] == 'Seq Scan':
+                    problems.append(('scan', node['Relation Name']))
+                elif node['Node Type'] in ('Sort', 'Incremental Sort'):
+                    problems.append(('sort', None))
+                nodes.extend(node.get('Plans', []))
+    return problems
+
+
+def suggest_fields(sql, table):
+    """
+    Campos del índice para la tabla: igualdades, rangos y orden
+    """
+    # Solo la parte tras el FROM principal: las subconsultas de la lista de columnas no cuentan
+    main_from = FROM_RE.search(sql)
+    sql = sql[main_from.end():] if main_from else sql
+    where = WHERE_RE.search(sql)
+    equalities, ranges = [], []
+    for match_table, column, operator in CONDITION_RE.findall(where.group(1) if where else ''):
+        if match_table != table:
+            continue
+        target = equalities if operator.upper() in EQUALITY_OPERATORS else ranges
+        if column not in equalities and column not in ranges:
+            target.append(column)
+    columns = [(column, False) for column in equalities + ranges]
+    # El ORDER BY de la consulta principal es el último
+    order_by = ORDER_BY_RE.findall(sql)
+    if order_by:
+        for match_table, column, descending in ORDER_COLUMN_RE.findall(order_by[-1]):
+            if match_table == table and column not in equalities:
+                columns.append((column, bool(descending)))
+    return _field_names(table, columns)
+
+
+def _field_names(table, columns):
+    model = model_for_table(table)
+    by_column = {field.column: field.name for field in model._meta.concrete_fields} if model else {}
+    fields = []
+    for column, descending in columns:
+        name = by_column.get(column, column)
+        if name == 'id' and fields:
+            # La clave primaria solo desempata el orden
+            continue
+        name = f'-{name}' if descending else name
+        if name not in fields and name.lstrip('-') not in [field.lstrip('-') for field in fields]:
+            fields.append(name)
+    return fields
+
+
+def analyze_queries(connection, queries):
+    """
+    Findings de una lista de (sql, params); solo se analizan los SELECT
+    """
+    findings = []
+    seen = set()
+    for sql, params in queries:
+        if not sql.lstrip().upper().startswith('SELECT') or sql in seen:
+            continue
+        seen.add(sql)
+        main_table = FROM_RE.search(sql)
+        proposed = set()
+        for kind, table in explain(connection, sql, params):
+            table = table or (main_table.group(1) if main_table else None)
+            if table is None:
+                continue
+            fields = suggest_fields(sql, table)
+            # Un recorrido sin filtros ni orden sobre la tabla no lo arregla un índice
+            if fields and (table, tuple(fields)) not in proposed:
+                proposed.add((table, tuple(fields)))
+                findings.append(Finding(kind, table, sql, fields))
+    return findings
+
+
+def existing_indexes(model):
+    """
+    Listas de columnas ya indexadas: Meta.indexes, unique_together, campos
+    únicos y claves foráneas
+    """
+    indexed = [list(index.fields) for index in model._meta.indexes]
+    indexed += [list(fields) for fields in model._meta.unique_together]
+    indexed += [
+        [field.name] for field in model._meta.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    ]
+    return indexed
+
+
+def is_covered(model, fields):
+    """
+    Si un índice existente empieza por los campos propuestos
+    """
+    wanted = [field.lstrip('-') for field in fields]
+    for index in existing_indexes(model):
+        columns = [field.lstrip('-') for field in index]
+        if columns[:len(wanted)] == wanted:
+            return True
+    return False
+
+
+def collect_suggestions(findings_by_url):
+    """
+    {(modelo, campos): [urls]} sin duplicados ni índices ya existentes
+    """
+    suggestions = OrderedDict()
+    for url, findings in findings_by_url.items():
+        for finding in findings:
+            model = finding.model
+            if model is None or is_covered(model, finding.fields):
+                continue
+            urls = suggestions.setdefault((model._meta.label, tuple(finding.fields)), [])
+            if url not in urls:
+                urls.append(url)
+    # Una propuesta que es prefijo de otra del mismo modelo queda cubierta por ella
+    for label, fields in list(suggestions):
+        longer = [
+            other for other_label, other in suggestions
+            if other_label == label and len(other) > len(fields) and other[:len(fields)] == fields
+        ]
+        if longer:
+            target = suggestions[label, longer[0]]
+            for url in suggestions.pop((label, fields)):
+                if url not in target:
+                    target.append(url)
+    return suggestions
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from cursos.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir los agregados diarios de ventas e inscripciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Primer día (AAAA-MM-DD); por defecto, el primero con actividad')
+        parser.add_argument('--until', help='Último día (AAAA-MM-DD); por defecto, hoy')
+        parser.add_argument('--chunk-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as exc:
+            raise CommandError(f'Fecha no válida: {exc}')
+        days = backfill_rollups(since, until, chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f'Agregados reconstruidos: {days} días'))
@@ -0,0 +1,96 @@
+import json
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from cursos.benchmark import JourneyRunner, compare_with_baseline, seed_benchmark_data
+
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+
+
+class Command(BaseCommand):
+    help = 'Medir latencia, rendimiento y consultas de los recorridos principales sobre una base de datos de pruebas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Multiplicador del volumen de datos sembrados')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=50, help='Iteraciones por recorrido')
+        parser.add_argument('--warmup', type=int, default=3, help='Iteraciones previas que no se miden')
+        parser.add_argument('--baseline', help='Fichero JSON de referencia con el que comparar')
+        parser.add_argument('--save-baseline', help='Guardar los resultados como referencia en este fichero')
+        parser.add_argument('--latency-tolerance', type=float, default=0.2, help='Margen sobre el p95 de referencia (0.2 = 20 %%)')
+        parser.add_argument('--keepdb', action='store_true', help='Conservar la base de datos de pruebas')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as handle:
+                    baseline = json.load(handle)['results']
+            except (OSError, ValueError, KeyError) as exc:
+                raise CommandError(f'No se pudo leer la referencia: {exc}')
+
+        setup_test_environment()
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        # Los errores se cuentan en el informe; no hace falta la traza de cada petición
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            # Solo se crea la base de pruebas del primario: nada de lecturas a réplicas
+            with override_settings(CACHES=BENCHMARK_CACHES, PAYMENT_FULFILLMENT_ASYNC=False, QUERY_BUDGET_RAISE=False,
+                                   DATABASE_REPLICA_VIEWS=[]):
+                results, elapsed = self._run(options)
+        finally:
+            request_logger.setLevel(previous_level)
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self._report(results, elapsed)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as handle:
+                json.dump({'options': {k: options[k] for k in ('scale', 'seed', 'requests')}, 'results': results},
+                          handle, indent=2)
+            self.stdout.write(f'Referencia guardada en {options["save_baseline"]}')
+        if baseline is not None:
+            regressions = compare_with_baseline(results, baseline, options['latency_tolerance'])
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(line))
+                raise CommandError(f'{len(regressions)} regresiones frente a {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones frente a la referencia'))
+
+    def _run(self, options):
+        started = time.perf_counter()
+        seed_benchmark_data(options['scale'], options['seed'], buyers=options['warmup'] + options['requests'])
+        self.stdout.write(f'Datos sembrados en {time.perf_counter() - started:.1f}s')
+
+        runner = JourneyRunner(options['seed'])
+        runner.run_browsing(options['warmup'])
+        runner.run_purchases(options['warmup'])
+        runner.reset_stats()
+
+        started = time.perf_counter()
+        runner.run_browsing(options['requests'])
+        runner.run_purchases(options['requests'])
+        return runner.results(), time.perf_counter() - started
+
+    def _report(self, results, elapsed):
+        header = f'{"recorrido":<22}{"n":>6}{"err":>5}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>8}{"consultas":>11}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        total = 0
+        for name, row in results.items():
+            total += row['requests']
+            self.stdout.write(
+                f'{name:<22}{row["requests"]:>6}{row["errors"]:>5}{row["p50_ms"]:>9.1f}{row["p95_ms"]:>9.1f}'
+                f'{row["p99_ms"]:>9.1f}{row["throughput_rps"]:>8.0f}{row["queries_mean"]:>7.1f}/{row["queries_max"]:<3}'
+            )
+        self.stdout.write(f'Total: {total} peticiones en {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} req/s)')
+        for name, row in results.items():
+            if row['first_error']:
+                self.stdout.write(self.style.WARNING(f'{name}: {row["errors"]} errores, el primero: {row["first_error"]}'))
@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from cursos.benchmark import percentile, seed_benchmark_data
+from cursos.models import Course
+from cursosmarlon.database import SQLITE_PRODUCTION_ENGINE
+from payments.models import Cart, CartItem
+from users.models import User, UserProfile
+
+# Configuración equivalente al backend SQLite de Django sin ajustes
+STOCK_OPTIONS = {
+    'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000, 'mmap_size': 0, 'cache_size': -2000},
+    'transaction_mode': 'DEFERRED',
+}
+
+
+def _read(rng, course_ids):
+    # Lo que hacen course_list y course_detail: listado paginado y un curso
+    list(Course.objects.filter(status='published').select_related('category', 'instructor').order_by('-created_at')[:12])
+    Course.objects.filter(status='published').count()
+    Course.objects.select_related('category').get(pk=rng.choice(course_ids))
+
+
+def _write(rng, user_id, course_ids):
+    # Lee y luego escribe en la misma transacción, como persist_cart, y actualiza el perfil como profile_view
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user_id=user_id)
+        stored = set(CartItem.objects.filter(cart=cart).values_list('course_id', flat=True))
+        if len(stored) >= 3:
+            CartItem.objects.filter(cart=cart).delete()
+        else:
+            CartItem.objects.get_or_create(cart=cart, course_id=rng.choice(course_ids))
+    UserProfile.objects.update_or_create(user_id=user_id, defaults={'city': f'Ciudad {rng.randint(1, 100)}'})
+
+
+def _run_worker(args):
+    """
+    Un worker (proceso) que mezcla lecturas y escrituras hasta el plazo
+    """
+    options, index, seconds, write_ratio, user_ids, course_ids = args
+    connection = connections['default']
+    connection.close()
+    if options is not None:
+        connection.settings_dict['OPTIONS'] = options
+    rng = random.Random(index)
+    user_id = user_ids[index % len(user_ids)]
+    result = {'reads': [], 'writes': [], 'locked': 0, 'errors': 0}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        write = rng.random() < write_ratio
+        started = time.perf_counter()
+        try:
+            if write:
+                _write(rng, user_id, course_ids)
+            else:
+                _read(rng, course_ids)
+        except OperationalError as exc:
+            result['locked' if 'locked' in str(exc) else 'errors'] += 1
+            continue
+        result['writes' if write else 'reads'].append(time.perf_counter() - started)
+    connection.close()
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Medir lecturas y escrituras concurrentes en SQLite con varios procesos, con y sin el modo producción'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,2,4,8', help='Procesos a probar, separados por comas')
+        parser.add_argument('--seconds', type=float, default=5, help='Duración de cada prueba')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Proporción de operaciones de escritura')
+        parser.add_argument('--compare', action='store_true', help='Repetir con la configuración SQLite por defecto')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este benchmark es solo para SQLite')
+        try:
+            workers = [int(value) for value in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers debe ser una lista de números')
+
+        modes = [('producción', None)]
+        if options['compare']:
+            if connection.settings_dict['ENGINE'] != SQLITE_PRODUCTION_ENGINE:
+                raise CommandError('--compare necesita el backend de producción (SQLITE_PRODUCTION=True)')
+            modes.append(('por defecto', STOCK_OPTIONS))
+
+        # Base de pruebas en fichero (no en memoria) para que la compartan los procesos
+        directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seed_benchmark_data(scale=1, buyers=max(workers))
+            user_ids = list(User.objects.filter(enrollments__isnull=True, is_instructor=False).values_list('pk', flat=True))
+            course_ids = list(Course.objects.values_list('pk', flat=True))
+            rows = []
+            for label, mode_options in modes:
+                for count in workers:
+                    rows.append((label, count, self._run(mode_options, count, options, user_ids, course_ids)))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(directory, ignore_errors=True)
+        self._report(rows)
+
+    def _run(self, mode_options, count, options, user_ids, course_ids):
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        tasks = [(mode_options, index, options['seconds'], options['write_ratio'], user_ids, course_ids) for index in range(count)]
+        started = time.perf_counter()
+        with context.Pool(count) as pool:
+            results = pool.map(_run_worker, tasks)
+        elapsed = time.perf_counter() - started
+        reads = sorted(latency for result in results for latency in result['reads'])
+        writes = sorted(latency for result in results for latency in result['writes'])
+        return {
+            'reads_per_second': len(reads) / elapsed,
+            'writes_per_second': len(writes) / elapsed,
+            'read_p95_ms': percentile(reads, 95) * 1000,
+            'write_p95_ms': percentile(writes, 95) * 1000,
+            'locked': sum(result['locked'] for result in results),
+            'errors': sum(result['errors'] for result in results),
+        }
+
+    def _report(self, rows):
+        self.stdout.write(
+            f'{"modo":<13}{"procesos":>9}{"lect/s":>10}{"escr/s":>10}{"p95 lect":>10}{"p95 escr":>10}{"bloqueos":>10}{"errores":>9}'
+        )
+        for label, count, stats in rows:
+            self.stdout.write(
+                f'{label:<13}{count:>9}{stats["reads_per_second"]:>10.0f}{stats["writes_per_second"]:>10.0f}'
+                f'{stats["read_p95_ms"]:>8.1f}ms{stats["write_p95_ms"]:>8.1f}ms{stats["locked"]:>10}{stats["errors"]:>9}'
+            )
+        if any(stats['locked'] for label, count, stats in rows if label == 'producción'):
+            self.stdout.write(self.style.WARNING('Hubo errores "database is locked" en el modo producción'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Modo producción sin errores de bloqueo'))
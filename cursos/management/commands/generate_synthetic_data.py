@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from cursos.synthetic import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generar datos sintéticos a gran escala con inserciones masivas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Cada unidad: 400 cursos y 10.000 estudiantes')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--workers', type=int, default=1, help='Procesos para los lotes de estudiantes')
+        parser.add_argument('--days', type=int, default=365, help='Días de historia que cubre la actividad')
+        parser.add_argument('--prefix', default='syn', help='Prefijo de correos y slugs, para varias generaciones')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='No reconstruir contadores, valoraciones, índice de búsqueda ni agregados')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(options['scale'], options['seed'], options['days'], options['prefix'])
+        if generator.exists():
+            raise CommandError(f'Ya hay datos con el prefijo "{options["prefix"]}"; usa otro --prefix')
+
+        started = time.perf_counter()
+        chunks = len(generator.chunks())
+        done = []
+
+        def progress(counts):
+            done.append(counts)
+            self.stdout.write(f'  lote {len(done)}/{chunks}: {sum(counts.values())} filas')
+
+        counts = generator.run(workers=options['workers'], on_chunk=progress)
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        for name, amount in counts.items():
+            self.stdout.write(f'{name:<16}{amount:>12}')
+        self.stdout.write(f'{total} filas en {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} filas/s)')
+
+        if not options['skip_derived']:
+            started = time.perf_counter()
+            generator.rebuild_derived_data()
+            self.stdout.write(f'Datos derivados reconstruidos en {time.perf_counter() - started:.1f}s')
+        self.stdout.write(self.style.SUCCESS('Datos sintéticos creados'))
@@ -0,0 +1,112 @@
+from contextlib import ExitStack
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from cursos.index_advisor import analyze_queries, collect_suggestions, is_covered
+from cursos.models import Course, Enrollment
+from cursosmarlon.middleware import QueryRecorder
+
+User = get_user_model()
+
+ADVISOR_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'index-advisor'}}
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+
+def _reject_writes(execute, sql, params, many, context):
+    if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+        raise CommandError(f'Una vista intentó escribir durante el análisis: {sql[:200]}')
+    return execute(sql, params, many, context)
+
+
+def _authenticate(client, user):
+    """
+    Como Client.force_login pero sin la señal user_logged_in, que escribe last_login
+    """
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+class Command(BaseCommand):
+    help = 'Capturar las consultas de cada URL, pasarlas por EXPLAIN y proponer índices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', default=[],
+                            help='URL adicional (se visita con el estudiante); se puede repetir')
+        parser.add_argument('--verbose-sql', action='store_true', help='Mostrar el SQL de cada consulta problemática')
+
+    def handle(self, *args, **options):
+        enrollment = Enrollment.objects.select_related('course', 'student').order_by('pk').first()
+        instructor = User.objects.filter(is_instructor=True, courses__isnull=False).order_by('pk').first()
+        course = Course.objects.filter(status='published').order_by('pk').first()
+        if enrollment is None or instructor is None or course is None:
+            raise CommandError('Faltan datos: crea algunos con `generate_synthetic_data`')
+
+        course_list = reverse('course_list')
+        visits = [
+            ('anónimo', reverse('home')),
+            ('anónimo', course_list),
+            ('anónimo', f'{course_list}?category={course.category.slug}&difficulty={course.difficulty}'),
+            ('anónimo', f'{course_list}?search={course.title.split()[0]}'),
+            ('estudiante', reverse('course_detail', args=[course.slug])),
+            ('estudiante', reverse('course_player', args=[enrollment.course.slug])),
+            ('estudiante', reverse('my_courses')),
+            ('estudiante', reverse('my_orders')),
+            ('instructor', reverse('dashboard')),
+            ('instructor', reverse('estadisticas')),
+        ] + [('estudiante', url) for url in options['url']]
+
+        connection = connections['default']
+        findings_by_url = {}
+        # Sesiones en la caché y sin transacción envolvente: el recorrido no escribe
+        # en la base de datos y, si alguna vista lo intenta, el comando falla
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=ADVISOR_CACHES, SESSION_ENGINE='django.contrib.sessions.backends.cache',
+                                   QUERY_BUDGET_RAISE=False, DATABASE_REPLICA_VIEWS=[]), ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(_reject_writes))
+                clients = {'anónimo': Client(), 'estudiante': Client(), 'instructor': Client()}
+                _authenticate(clients['estudiante'], enrollment.student)
+                _authenticate(clients['instructor'], instructor)
+                for who, url in visits:
+                    with QueryRecorder(using='default', keep_queries=True) as recorder:
+                        response = clients[who].get(url)
+                    if not 200 <= response.status_code < 300:
+                        raise CommandError(f'{url} ({who}) respondió {response.status_code}: sin consultas que analizar')
+                    queries = [(sql, params) for alias, sql, params in recorder.queries]
+                    findings = analyze_queries(connection, queries)
+                    findings_by_url[url] = findings
+                    self.stdout.write(
+                        f'{response.status_code} {url} ({who}): {recorder.count} consultas, {len(findings)} con problemas'
+                    )
+                    for finding in findings:
+                        what = 'recorrido completo' if finding.kind == 'scan' else 'ordenación en memoria'
+                        covered = finding.model is not None and is_covered(finding.model, finding.fields)
+                        self.stdout.write(
+                            f'    {what} de {finding.table} → ({", ".join(finding.fields)})'
+                            + (' ya indexado; el planificador no lo usa' if covered else '')
+                        )
+                        if options['verbose_sql']:
+                            self.stdout.write(f'      {finding.sql}')
+        finally:
+            teardown_test_environment()
+
+        suggestions = collect_suggestions(findings_by_url)
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('No faltan índices para estas URLs'))
+            return
+        self.stdout.write(self.style.WARNING(f'\nÍndices propuestos ({len(suggestions)}):'))
+        for (label, fields), urls in suggestions.items():
+            field_list = ', '.join(f"'{field}'" for field in fields)
+            self.stdout.write(f'  {label}: models.Index(fields=[{field_list}])  ← {", ".join(urls)}')
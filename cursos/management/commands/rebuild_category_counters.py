@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from cursos.counters import rebuild_category_counters
+
+
+class Command(BaseCommand):
+    help = 'Recalcular el número de cursos publicados de cada categoría'
+
+    def handle(self, *args, **options):
+        updated = rebuild_category_counters()
+        self.stdout.write(self.style.SUCCESS(f'Contadores actualizados: {updated} categorías corregidas'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from cursos.ratings import rebuild_course_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcular los resúmenes de valoraciones de todos los cursos'
+
+    def handle(self, *args, **options):
+        total = rebuild_course_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes de valoraciones reconstruidos: {total} cursos'))
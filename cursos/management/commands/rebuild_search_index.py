@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from cursos.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir el índice de búsqueda de texto completo de los cursos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {total} cursos'))
@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from cursosmarlon.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copiar la base de datos SQLite principal a las réplicas locales (sustituto de la replicación)'
+
+    def handle(self, *args, **options):
+        replicas = replica_aliases()
+        if not replicas:
+            raise CommandError('No hay réplicas configuradas (DATABASE_REPLICA_URLS)')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Solo para SQLite: en PostgreSQL las réplicas se sincronizan por replicación')
+        primary.ensure_connection()
+        for alias in replicas:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'La réplica {alias} no es SQLite')
+            replica.close()
+            # API de copia en caliente de SQLite: copia consistente aunque haya escrituras
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'{alias} sincronizada'))
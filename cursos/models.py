@@ -2,6 +2,19 @@ from django.db import models
 from django.conf import settings
 from django.urls import reverse
 from django.utils.text import slugify
+from django.db.models import Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+def final_price_expression(prefix=''):
+    """
+    Equivalente en SQL de Course.final_price (un descuento de 0 no cuenta)
+    """
+    return Coalesce(
+        NullIf(f'{prefix}discount_price', Value(0)),
+        f'{prefix}price',
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
 
 class Category(models.Model):
     """
@@ -12,6 +25,8 @@ class Category(models.Model):
     description = models.TextField(blank=True)
     icon = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=True)
+    # Contador materializado de cursos publicados (ver cursos/counters.py)
+    published_courses_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -69,6 +84,13 @@ class Course(models.Model):
         verbose_name = 'Curso'
         verbose_name_plural = 'Cursos'
         ordering = ['-created_at']
+        # Catálogo: publicados por fecha, con o sin filtro de categoría, dificultad o destacados
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='courses_status_created_idx'),
+            models.Index(fields=['status', 'category', '-created_at'], name='courses_status_cat_idx'),
+            models.Index(fields=['status', 'difficulty', '-created_at'], name='courses_status_diff_idx'),
+            models.Index(fields=['status', 'is_featured', '-created_at'], name='courses_status_feat_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -104,6 +126,9 @@ class Module(models.Model):
         verbose_name = 'Módulo'
         verbose_name_plural = 'Módulos'
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['course', 'order'], name='modules_course_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -154,6 +179,12 @@ class Enrollment(models.Model):
         verbose_name = 'Inscripción'
         verbose_name_plural = 'Inscripciones'
         unique_together = ['student', 'course']
+        # Mis cursos (por fecha) y rangos de fechas de los agregados diarios
+        indexes = [
+            models.Index(fields=['student', '-enrolled_at'], name='enroll_student_date_idx'),
+            models.Index(fields=['enrolled_at'], name='enroll_enrolled_at_idx'),
+            models.Index(fields=['completed_at'], name='enroll_completed_at_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.full_name} - {self.course.title}"
@@ -192,6 +223,125 @@ class Review(models.Model):
         verbose_name_plural = 'Reseñas'
         unique_together = ['course', 'student']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['course', '-created_at'], name='reviews_course_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.course.title} - {self.rating} estrellas"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valoración leída de la base de datos, para actualizar el resumen por diferencia
+        instance._loaded_rating = instance.__dict__.get('rating')
+        return instance
+
+class CourseRating(models.Model):
+    """
+    Resumen de valoraciones de un curso, mantenido de forma incremental
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'course_ratings'
+        verbose_name = 'Resumen de Valoraciones'
+        verbose_name_plural = 'Resúmenes de Valoraciones'
+    
+    def __str__(self):
+        return f"{self.course_id} - {self.average} ({self.review_count})"
+    
+    @property
+    def average(self):
+        if not self.review_count:
+            return 0
+        return round(self.rating_total / self.review_count, 1)
+    
+    @property
+    def stars(self):
+        """
+        Estrellas a dibujar: 'full', 'half' o 'empty'
+        """
+        average = self.average
+        full = int(average)
+        half = 1 if average - full >= 0.5 else 0
+        return ['full'] * full + ['half'] * half + ['empty'] * (5 - full - half)
+    
+    @property
+    def histogram(self):
+        """
+        Lista de (estrellas, cantidad, porcentaje) de 5 a 1
+        """
+        total = self.review_count or 1
+        return [
+            (stars, getattr(self, f'stars_{stars}'), round(getattr(self, f'stars_{stars}') * 100 / total))
+            for stars in range(5, 0, -1)
+        ]
+
+class DailyStats(models.Model):
+    """
+    Métricas diarias de ventas e inscripciones (ver cursos/rollups.py)
+    """
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    enrollments = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    refunds = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['-day']
+
+class CourseDailyStats(DailyStats):
+    """
+    Agregados diarios por curso
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    
+    class Meta(DailyStats.Meta):
+        db_table = 'course_daily_stats'
+        verbose_name = 'Estadística Diaria de Curso'
+        verbose_name_plural = 'Estadísticas Diarias de Cursos'
+        unique_together = ['course', 'day']
+    
+    def __str__(self):
+        return f"{self.course_id} - {self.day}"
+
+class InstructorDailyStats(DailyStats):
+    """
+    Agregados diarios por instructor (suma de sus cursos)
+    """
+    instructor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_stats')
+    
+    class Meta(DailyStats.Meta):
+        db_table = 'instructor_daily_stats'
+        verbose_name = 'Estadística Diaria de Instructor'
+        verbose_name_plural = 'Estadísticas Diarias de Instructores'
+        unique_together = ['instructor', 'day']
+    
+    def __str__(self):
+        return f"{self.instructor_id} - {self.day}"
+
+class StatsDirtyDay(models.Model):
+    """
+    Días fuera de la ventana incremental que hay que volver a agregar
+    """
+    day = models.DateField(primary_key=True)
+    
+    class Meta:
+        db_table = 'stats_dirty_days'
+        verbose_name = 'Día Pendiente de Agregar'
+        verbose_name_plural = 'Días Pendientes de Agregar'
+    
+    def __str__(self):
+        return str(self.day)
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_cache_version, bump_cache_version
+from .models import Module
+
+OUTLINE_NAMESPACE = 'course_outline'
+OUTLINE_CACHE_TIMEOUT = getattr(settings, 'OUTLINE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+MODULE_FIELDS = ('id', 'title', 'description', 'order', 'is_free')
+LESSON_FIELDS = ('id', 'title', 'lesson_type', 'duration_minutes', 'order', 'is_free')
+
+
+def build_course_outline(course_id):
+    """
+    Construye el árbol Módulo → Lección de un curso con una sola consulta
+    """
+    rows = (
+        Module.objects.filter(course_id=course_id)
+        .order_by('order', 'id', 'lessons__order', 'lessons__id')
+        .values_list(*MODULE_FIELDS, *[f'lessons__{field}' for field in LESSON_FIELDS])
+    )
+    outline = []
+    current = None
+    for row in rows:
+        module_data, lesson_data = row[:len(MODULE_FIELDS)], row[len(MODULE_FIELDS):]
+        if current is None or current['id'] != module_data[0]:
+            current = dict(zip(MODULE_FIELDS, module_data), lessons=[])
+            outline.append(current)
+        if lesson_data[0] is not None:
+            current['lessons'].append(dict(zip(LESSON_FIELDS, lesson_data)))
+    return outline
+
+
+def get_course_outline(course_id):
+    """
+    Temario del curso desde caché; se reconstruye al cambiar de versión
+    """
+    version = get_cache_version(OUTLINE_NAMESPACE, course_id)
+    key = f'{OUTLINE_NAMESPACE}:{course_id}:{version}'
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_course_outline(course_id)
+        cache.set(key, outline, OUTLINE_CACHE_TIMEOUT)
+    return outline
+
+
+def invalidate_course_outline(course_id):
+    if course_id:
+        bump_cache_version(OUTLINE_NAMESPACE, course_id)
+
+
+def outline_lessons(outline):
+    """
+    Lista plana de las lecciones del temario en orden
+    """
+    return [lesson for module in outline for lesson in module['lessons']]
@@ -0,0 +1,122 @@
+"""
+Paginación por cursor (keyset) para el catálogo de cursos.
+
+En lugar de OFFSET, cada página continúa desde el último par
+(created_at, id) visto, por lo que la página 500 cuesta lo mismo que la 1.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils.dateparse import parse_datetime
+
+from .models import Category
+
+CURSOR_SALT = 'cursos.pagination.cursor'
+# Segundos que se reutiliza el total aproximado de resultados
+CATALOG_COUNT_TIMEOUT = getattr(settings, 'CATALOG_COUNT_TIMEOUT', 60 * 5)
+
+
+def encode_cursor(course, direction):
+    return signing.dumps(
+        {'c': course.created_at.isoformat(), 'i': course.pk, 'd': direction},
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decode_cursor(token):
+    """
+    Devuelve (created_at, id, dirección) o None si el cursor no es válido
+    """
+    try:
+        data = signing.loads(token, salt=CURSOR_SALT)
+        created_at = parse_datetime(data['c'])
+        if created_at is None or data['d'] not in ('next', 'prev'):
+            return None
+        return created_at, int(data['i']), data['d']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """
+    Página de resultados con la interfaz mínima que usan las plantillas
+    """
+
+    def __init__(self, object_list, count, has_next, has_previous):
+        self.object_list = object_list
+        self.count = count
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(object_list[-1], 'next') if has_next and object_list else None
+        self.previous_cursor = encode_cursor(object_list[0], 'prev') if has_previous and object_list else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Pagina un queryset en orden descendente de (created_at, id)
+    """
+
+    def __init__(self, queryset, per_page, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count = count
+
+    def get_page(self, token=None):
+        cursor = decode_cursor(token) if token else None
+        queryset = self.queryset
+        if cursor is None:
+            rows = list(queryset.order_by('-created_at', '-id')[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            return KeysetPage(rows[:self.per_page], self.count, has_next, False)
+
+        created_at, pk, direction = cursor
+        if direction == 'next':
+            rows = list(
+                queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+                .order_by('-created_at', '-id')[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            return KeysetPage(rows, self.count, has_more, True)
+
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return KeysetPage(rows, self.count, True, has_more)
+
+
+def estimate_catalog_count(queryset, category_slug=None, difficulty=None):
+    """
+    Total aproximado de cursos publicados para los filtros del catálogo.
+
+    Sin filtro de dificultad se usan los contadores materializados de las
+    categorías; en otro caso se cachea un COUNT durante unos minutos.
+    """
+    key = f'catalog_count:{category_slug or "*"}:{difficulty or "*"}'
+
+    def compute():
+        if not difficulty:
+            categories = Category.objects.all()
+            if category_slug:
+                categories = categories.filter(slug=category_slug)
+            return categories.aggregate(total=Sum('published_courses_count'))['total'] or 0
+        return queryset.count()
+
+    return cache.get_or_set(key, compute, CATALOG_COUNT_TIMEOUT)
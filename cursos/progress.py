@@ -0,0 +1,167 @@
+"""
+Progreso de lecciones con escrituras agrupadas.
+
+El estado de cada inscripción (lecciones completadas y pendientes de
+guardar) vive en caché. Marcar una lección solo toca la caché; las filas de
+LessonProgress y el porcentaje de Enrollment se escriben en lote al vaciar
+el búfer, ya sea en la misma petición o desde una tarea de Celery.
+
+El estado se modifica siempre con el bloqueo de la inscripción
+(cache_lock). El vaciado guarda una copia de las pendientes, las escribe
+fuera del bloqueo y después quita del estado solo esas lecciones; el
+porcentaje se calcula con lo que hay en la base de datos. Agrupar
+escrituras exige una caché compartida: el worker de Celery tiene que ver
+el mismo estado que los workers web.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import cache_lock, is_shared_cache
+from .models import Enrollment, LessonProgress
+from .outline import get_course_outline, outline_lessons
+
+PROGRESS_NAMESPACE = 'lesson_progress'
+# Con LESSON_PROGRESS_BATCHING las escrituras se aplazan a Celery
+PROGRESS_BATCHING = getattr(settings, 'LESSON_PROGRESS_BATCHING', False)
+PROGRESS_BATCH_SIZE = getattr(settings, 'LESSON_PROGRESS_BATCH_SIZE', 10)
+PROGRESS_FLUSH_DELAY = getattr(settings, 'LESSON_PROGRESS_FLUSH_DELAY', 30)
+
+
+class LessonNotInCourse(Exception):
+    pass
+
+
+def check_progress_batching():
+    """
+    Comprobación de arranque: agrupar escrituras necesita una caché compartida
+    """
+    if PROGRESS_BATCHING and not is_shared_cache():
+        raise ImproperlyConfigured(
+            'LESSON_PROGRESS_BATCHING necesita una caché compartida (REDIS_CACHE_URL): con la caché '
+            'local Celery no ve las lecciones pendientes de los workers web'
+        )
+
+
+def _state_key(user_id, course_id):
+    return f'{PROGRESS_NAMESPACE}:{user_id}:{course_id}'
+
+
+def _lock(user_id, course_id):
+    return cache_lock(f'{_state_key(user_id, course_id)}:lock')
+
+
+def _load_state(user_id, course_id):
+    """
+    Estado del progreso desde caché; se carga de la base de datos una vez
+    """
+    state = cache.get(_state_key(user_id, course_id))
+    if state is not None:
+        return state
+    enrollment_id = (
+        Enrollment.objects.filter(student_id=user_id, course_id=course_id).values_list('id', flat=True).first()
+    )
+    if enrollment_id is None:
+        return None
+    done = LessonProgress.objects.filter(enrollment_id=enrollment_id, completed=True).values_list('lesson_id', flat=True)
+    state = {'enrollment_id': enrollment_id, 'done': set(done), 'pending': []}
+    # Si otra petición ya lo ha cargado, vale el de la caché (puede tener pendientes)
+    if not cache.add(_state_key(user_id, course_id), state, None):
+        state = cache.get(_state_key(user_id, course_id), state)
+    return state
+
+
+def _percentage(done, lesson_ids):
+    if not lesson_ids:
+        return 0
+    return min(100, len(done & lesson_ids) * 100 // len(lesson_ids))
+
+
+def record_lesson_completion(user, course_id, lesson_id):
+    """
+    Marca una lección como completada y devuelve el nuevo porcentaje
+    """
+    lesson_ids = {lesson['id'] for lesson in outline_lessons(get_course_outline(course_id))}
+    if lesson_id not in lesson_ids:
+        raise LessonNotInCourse(lesson_id)
+    with _lock(user.pk, course_id):
+        state = _load_state(user.pk, course_id)
+        if state is None:
+            raise Enrollment.DoesNotExist()
+        if lesson_id in state['done']:
+            return _percentage(state['done'], lesson_ids)
+        state['done'].add(lesson_id)
+        state['pending'].append(lesson_id)
+        cache.set(_state_key(user.pk, course_id), state, None)
+    percentage = _percentage(state['done'], lesson_ids)
+
+    if not PROGRESS_BATCHING or percentage == 100 or len(state['pending']) >= PROGRESS_BATCH_SIZE:
+        _flush(user.pk, course_id, lesson_ids)
+    elif cache.add(f'{_state_key(user.pk, course_id)}:scheduled', True, PROGRESS_FLUSH_DELAY):
+        from .tasks import flush_lesson_progress_task
+        flush_lesson_progress_task.apply_async(args=[user.pk, course_id], countdown=PROGRESS_FLUSH_DELAY)
+    return percentage
+
+
+def flush_lesson_progress(user_id, course_id):
+    """
+    Escribe en lote las lecciones pendientes y el porcentaje de la inscripción
+    """
+    flushed, _ = _flush(user_id, course_id)
+    return flushed
+
+
+def _flush(user_id, course_id, lesson_ids=None):
+    """
+    (lecciones escritas, porcentaje guardado); el porcentaje es None si no
+    había nada pendiente
+    """
+    key = _state_key(user_id, course_id)
+    cache.delete(f'{key}:scheduled')
+    state = cache.get(key)
+    if not state or not state['pending']:
+        return 0, None
+    pending = list(state['pending'])
+    enrollment_id = state['enrollment_id']
+    now = timezone.now()
+    LessonProgress.objects.bulk_create(
+        [
+            LessonProgress(enrollment_id=enrollment_id, lesson_id=lesson_id, completed=True, completed_at=now)
+            for lesson_id in pending
+        ],
+        update_conflicts=True,
+        unique_fields=['enrollment', 'lesson'],
+        update_fields=['completed', 'completed_at'],
+    )
+    if lesson_ids is None:
+        lesson_ids = {lesson['id'] for lesson in outline_lessons(get_course_outline(course_id))}
+    # La base de datos tiene también lo que hayan vaciado otros workers
+    done = set(
+        LessonProgress.objects.filter(enrollment_id=enrollment_id, completed=True, lesson_id__in=lesson_ids)
+        .values_list('lesson_id', flat=True)
+    )
+    percentage = _percentage(done, lesson_ids)
+    changes = {'progress': percentage}
+    if percentage == 100:
+        changes['completed_at'] = Coalesce('completed_at', Value(now))
+    Enrollment.objects.filter(pk=enrollment_id).update(**changes)
+
+    # Solo se quitan las lecciones escritas: las marcadas mientras tanto siguen pendientes
+    with _lock(user_id, course_id):
+        state = cache.get(key)
+        if state is not None:
+            flushed = set(pending)
+            state['pending'] = [lesson_id for lesson_id in state['pending'] if lesson_id not in flushed]
+            state['done'] |= done
+            cache.set(key, state, None)
+    return len(pending), percentage
+
+
+def reset_progress_state(user_id, course_id):
+    """
+    Olvida el estado cacheado (por ejemplo, al borrar la inscripción)
+    """
+    cache.delete(_state_key(user_id, course_id))
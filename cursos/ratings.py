@@ -0,0 +1,53 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import CourseRating, Review
+
+RATING_VALUES = range(1, 6)
+
+
+def apply_rating_change(course_id, old=None, new=None):
+    """
+    Aplica al resumen del curso el alta, cambio o baja de una valoración
+    """
+    if old == new:
+        return
+    changes = {}
+    if old is not None:
+        changes[f'stars_{old}'] = F(f'stars_{old}') - 1
+    if new is not None:
+        changes[f'stars_{new}'] = F(f'stars_{new}') + 1
+    changes['rating_total'] = F('rating_total') + (new or 0) - (old or 0)
+    if old is None:
+        changes['review_count'] = F('review_count') + 1
+    elif new is None:
+        changes['review_count'] = F('review_count') - 1
+
+    if CourseRating.objects.filter(course_id=course_id).update(**changes):
+        return
+    if old is not None:
+        # Sin resumen previo no hay nada que descontar: lo corregirá la reconstrucción
+        return
+    try:
+        with transaction.atomic():
+            CourseRating.objects.create(course_id=course_id, review_count=1, rating_total=new, **{f'stars_{new}': 1})
+    except IntegrityError:
+        # Otro proceso creó el resumen a la vez
+        CourseRating.objects.filter(course_id=course_id).update(**changes)
+
+
+def rebuild_course_ratings():
+    """
+    Recalcula todos los resúmenes a partir de la tabla de reseñas
+    """
+    aggregates = {f'stars_{value}': Count('id', filter=Q(rating=value)) for value in RATING_VALUES}
+    rows = (
+        Review.objects.values('course_id')
+        .annotate(review_count=Count('id'), rating_total=Sum('rating'), **aggregates)
+        .order_by()
+    )
+    summaries = [CourseRating(**row) for row in rows]
+    with transaction.atomic():
+        CourseRating.objects.all().delete()
+        CourseRating.objects.bulk_create(summaries, batch_size=1000)
+    return len(summaries)
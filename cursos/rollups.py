@@ -0,0 +1,221 @@
+"""
+Agregados diarios de ventas e inscripciones para el panel de estadísticas.
+
+Cada día se recalcula entero a partir de Payment, Order/OrderItem y
+Enrollment y se reemplaza en CourseDailyStats e InstructorDailyStats, así
+que recalcular es idempotente. La tarea periódica repasa los últimos días
+(más los marcados en StatsDirtyDay por cambios antiguos) y
+`backfill_stats_rollups` reconstruye cualquier rango completo.
+
+Los pagos cuentan en el día de completed_at: un pago reembolsado deja de
+sumar en revenue y pasa a refunds/refunded_amount en ese mismo día.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from payments.models import OrderItem, Payment
+from .models import Course, CourseDailyStats, Enrollment, InstructorDailyStats, StatsDirtyDay
+
+METRICS = ('revenue', 'orders', 'enrollments', 'completions', 'refunds', 'refunded_amount')
+# Días recientes que se recalculan en cada ejecución de la tarea
+ROLLUP_LOOKBACK_DAYS = getattr(settings, 'STATS_ROLLUP_LOOKBACK_DAYS', 2)
+ROLLUP_LOCK_KEY = 'stats_rollups:lock'
+ROLLUP_LOCK_TIMEOUT = 60 * 30
+
+
+def _empty_metrics():
+    return {'revenue': Decimal('0'), 'orders': 0, 'enrollments': 0, 'completions': 0,
+            'refunds': 0, 'refunded_amount': Decimal('0')}
+
+
+def _day_bounds(start, end):
+    """
+    Instantes [inicio, fin) que cubren los días locales de start a end
+    """
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def _grouped(queryset, date_field, start, end, group_by, **aggregates):
+    """
+    Agregados por (día local, group_by) con filtro por rango sobre la columna
+    de fecha, para que pueda usar sus índices
+    """
+    since, until = _day_bounds(start, end)
+    return (
+        queryset.filter(**{f'{date_field}__gte': since, f'{date_field}__lt': until})
+        .annotate(day=TruncDate(date_field), key=F(group_by))
+        .values('day', 'key')
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def _completed_orders(start, end, group_by):
+    # Una orden con varios cursos cuenta una vez por curso y una vez por instructor
+    return _grouped(
+        OrderItem.objects.filter(order__status='completed'), 'order__completed_at', start, end, group_by,
+        orders=Count('order_id', distinct=True),
+    )
+
+
+def collect_course_metrics(start, end):
+    """
+    Métricas por (día, curso) entre start y end, ambos incluidos
+    """
+    rows = defaultdict(_empty_metrics)
+
+    def add(grouped):
+        for row in grouped:
+            metrics = rows[row.pop('day'), row.pop('key')]
+            for name, value in row.items():
+                metrics[name] += value or 0
+
+    def add_grouped(queryset, date_field, **aggregates):
+        add(_grouped(queryset, date_field, start, end, 'course_id', **aggregates))
+
+    add_grouped(Payment.objects.filter(status='completed'), 'completed_at', revenue=Sum('amount'))
+    add_grouped(Payment.objects.filter(status='refunded'), 'completed_at', refunds=Count('id'), refunded_amount=Sum('amount'))
+    add(_completed_orders(start, end, 'course_id'))
+    add_grouped(Enrollment.objects.all(), 'enrolled_at', enrollments=Count('id'))
+    add_grouped(Enrollment.objects.all(), 'completed_at', completions=Count('id'))
+    return rows
+
+
+def rebuild_days(start, end):
+    """
+    Reemplaza los agregados de los días entre start y end.
+    Devuelve el número de filas por curso escritas.
+    """
+    course_rows = collect_course_metrics(start, end)
+    instructors = dict(
+        Course.objects.filter(pk__in={course_id for _, course_id in course_rows}).values_list('pk', 'instructor_id')
+    )
+    instructor_rows = defaultdict(_empty_metrics)
+    for (day, course_id), metrics in course_rows.items():
+        totals = instructor_rows[day, instructors[course_id]]
+        for name in METRICS:
+            if name != 'orders':
+                totals[name] += metrics[name]
+    for row in _completed_orders(start, end, 'course__instructor_id'):
+        instructor_rows[row['day'], row['key']]['orders'] = row['orders']
+
+    with transaction.atomic():
+        CourseDailyStats.objects.filter(day__gte=start, day__lte=end).delete()
+        InstructorDailyStats.objects.filter(day__gte=start, day__lte=end).delete()
+        CourseDailyStats.objects.bulk_create(
+            [CourseDailyStats(day=day, course_id=course_id, **metrics) for (day, course_id), metrics in course_rows.items()],
+            batch_size=1000,
+        )
+        InstructorDailyStats.objects.bulk_create(
+            [
+                InstructorDailyStats(day=day, instructor_id=instructor_id, **metrics)
+                for (day, instructor_id), metrics in instructor_rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(course_rows)
+
+
+def mark_days_dirty(*moments):
+    """
+    Apunta para recalcular los días de los instantes dados (se ignoran los None)
+    """
+    days = {timezone.localdate(moment) for moment in moments if moment is not None}
+    if days:
+        StatsDirtyDay.objects.bulk_create([StatsDirtyDay(day=day) for day in days], ignore_conflicts=True)
+
+
+def update_rollups():
+    """
+    Actualización incremental: últimos días, huecos desde la última
+    ejecución y días marcados. Devuelve los días recalculados o None si
+    ya hay otra actualización en curso.
+    """
+    if not cache.add(ROLLUP_LOCK_KEY, True, ROLLUP_LOCK_TIMEOUT):
+        return None
+    try:
+        today = timezone.localdate()
+        latest = CourseDailyStats.objects.aggregate(latest=Max('day'))['latest']
+        if latest is None:
+            return backfill_rollups(until=today)
+        start = min(latest, today) - timedelta(days=ROLLUP_LOOKBACK_DAYS)
+        dirty = set(StatsDirtyDay.objects.values_list('day', flat=True))
+        rebuild_days(start, today)
+        days = (today - start).days + 1
+        for day in sorted(day for day in dirty if day < start):
+            rebuild_days(day, day)
+            days += 1
+        StatsDirtyDay.objects.filter(day__in=dirty).delete()
+        return days
+    finally:
+        cache.delete(ROLLUP_LOCK_KEY)
+
+
+def first_activity_day():
+    """
+    Primer día con pagos o inscripciones, o None si no hay datos
+    """
+    moments = [
+        Payment.objects.aggregate(first=Min('completed_at'))['first'],
+        Enrollment.objects.aggregate(first=Min('enrolled_at'))['first'],
+    ]
+    moments = [moment for moment in moments if moment is not None]
+    return timezone.localdate(min(moments)) if moments else None
+
+
+def backfill_rollups(since=None, until=None, chunk_days=31):
+    """
+    Reconstruye los agregados de un rango en tramos de chunk_days días.
+    Devuelve el número de días recalculados.
+    """
+    until = until or timezone.localdate()
+    since = since or first_activity_day()
+    if since is None or since > until:
+        return 0
+    start = since
+    while start <= until:
+        end = min(start + timedelta(days=chunk_days - 1), until)
+        rebuild_days(start, end)
+        start = end + timedelta(days=1)
+    StatsDirtyDay.objects.filter(day__gte=since, day__lte=until).delete()
+    return (until - since).days + 1
+
+
+def instructor_dashboard(instructor, days=30):
+    """
+    Datos del panel de estadísticas leídos solo de los agregados
+    """
+    totals = InstructorDailyStats.objects.filter(instructor=instructor).aggregate(
+        **{name: Sum(name) for name in METRICS}
+    )
+    totals = {name: totals[name] or 0 for name in METRICS}
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    recent = {
+        row.day: row
+        for row in InstructorDailyStats.objects.filter(instructor=instructor, day__gte=since)
+    }
+    series = [
+        recent.get(day) or InstructorDailyStats(instructor=instructor, day=day)
+        for day in (since + timedelta(days=offset) for offset in range(days))
+    ]
+
+    courses = (
+        CourseDailyStats.objects.filter(course__instructor=instructor)
+        .values('course_id', 'course__title')
+        .annotate(**{name: Sum(name) for name in METRICS})
+        .order_by('-revenue', '-enrollments')
+    )
+    return {'totals': totals, 'series': series[::-1], 'courses': list(courses)}
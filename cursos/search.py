@@ -0,0 +1,192 @@
+"""
+Búsqueda de texto completo para el catálogo de cursos.
+
+Cada motor de base de datos mantiene su propio índice en una tabla auxiliar:
+FTS5 en SQLite y tsvector + GIN en PostgreSQL. El índice se actualiza con
+las señales de Course y se puede reconstruir con `rebuild_search_index`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ('title', 'short_description', 'description', 'what_you_learn')
+
+# Solo letras y dígitos: evita inyectar operadores del lenguaje de consulta
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _terms(text):
+    return TERM_RE.findall((text or '').lower())[:10]
+
+
+class SQLiteSearchBackend:
+    """
+    Índice FTS5 con plegado de acentos (unicode61 remove_diacritics)
+    """
+    table = 'courses_fts'
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{', '.join(SEARCH_FIELDS)}, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def index_courses(self, courses):
+        rows = [(c.pk, *[getattr(c, f) or '' for f in SEARCH_FIELDS]) for c in courses]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(r[0],) for r in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_course(self, course_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [course_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def search(self, queryset, text):
+        terms = _terms(text)
+        if not terms:
+            return queryset
+        match = ' '.join(f'"{term}"*' for term in terms)
+        table = queryset.model._meta.db_table
+        # bm25 devuelve valores negativos: cuanto menor, más relevante
+        rank = RawSQL(
+            f"SELECT -bm25({self.table}, 10.0, 4.0, 1.0, 2.0) FROM {self.table} "
+            f"WHERE {self.table} MATCH %s AND rowid = {table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+        matches = RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [match])
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+
+class PostgreSQLSearchBackend:
+    """
+    Índice tsvector ponderado con índice GIN y plegado de acentos (unaccent)
+    """
+    table = 'course_search_index'
+    config = 'spanish'
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "course_id bigint PRIMARY KEY REFERENCES courses(id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin ON {self.table} USING GIN (document)"
+            )
+
+    def index_courses(self, courses):
+        weights = ('A', 'B', 'D', 'C')
+        document = ' || '.join(
+            f"setweight(to_tsvector('{self.config}', unaccent(%s)), '{weight}')" for weight in weights
+        )
+        rows = [(c.pk, *[getattr(c, f) or '' for f in SEARCH_FIELDS]) for c in courses]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (course_id, document) VALUES (%s, {document}) "
+                "ON CONFLICT (course_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove_course(self, course_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE course_id = %s", [course_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def search(self, queryset, text):
+        terms = _terms(text)
+        if not terms:
+            return queryset
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        table = queryset.model._meta.db_table
+        query_sql = f"to_tsquery('{self.config}', unaccent(%s))"
+        rank = RawSQL(
+            f"SELECT ts_rank_cd(document, {query_sql}) FROM {self.table} WHERE course_id = {table}.id",
+            [tsquery],
+            output_field=FloatField(),
+        )
+        matches = RawSQL(f"SELECT course_id FROM {self.table} WHERE document @@ {query_sql}", [tsquery])
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+
+class SimpleSearchBackend:
+    """
+    Alternativa sin índice para motores sin soporte de texto completo
+    """
+
+    def ensure_index(self):
+        pass
+
+    def index_courses(self, courses):
+        pass
+
+    def remove_course(self, course_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, queryset, text):
+        for term in _terms(text):
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, SimpleSearchBackend)()
+
+
+def search_courses(queryset, text):
+    """
+    Filtra y ordena por relevancia un queryset de cursos
+    """
+    return get_search_backend().search(queryset, text)
+
+
+def rebuild_search_index(chunk_size=1000):
+    """
+    Regenera el índice completo a partir de la tabla de cursos
+    """
+    from .models import Course
+
+    backend = get_search_backend()
+    backend.ensure_index()
+    backend.clear()
+    total = 0
+    batch = []
+    for course in Course.objects.only('pk', *SEARCH_FIELDS).iterator(chunk_size=chunk_size):
+        batch.append(course)
+        if len(batch) >= chunk_size:
+            backend.index_courses(batch)
+            total += len(batch)
+            batch = []
+    backend.index_courses(batch)
+    return total + len(batch)
@@ -0,0 +1,183 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Category, Course, Module, Lesson, Enrollment, Review
+from .cache import invalidate_home_sections
+from .counters import adjust_category_counter
+from .entitlements import invalidate_enrollments
+from .outline import invalidate_course_outline
+from .progress import reset_progress_state
+from .ratings import apply_rating_change
+from .rollups import mark_days_dirty
+from .search import get_search_backend
+
+
+def ensure_search_index(sender, **kwargs):
+    """
+    Crea la tabla del índice de búsqueda tras aplicar las migraciones
+    """
+    get_search_backend().ensure_index()
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_state(sender, instance, **kwargs):
+    """
+    Guarda la categoría y el estado previos del curso antes de guardarlo
+    """
+    previous = None
+    if instance.pk:
+        previous = Course.objects.filter(pk=instance.pk).values('category_id', 'status').first()
+    instance._previous_state = previous
+
+
+@receiver(post_save, sender=Course)
+def update_category_counters_on_save(sender, instance, **kwargs):
+    """
+    Mantiene los contadores de cursos publicados al crear o modificar un curso
+    """
+    previous = getattr(instance, '_previous_state', None)
+    was_published = previous is not None and previous['status'] == 'published'
+    is_published = instance.status == 'published'
+    if was_published and is_published and previous['category_id'] == instance.category_id:
+        return
+    if was_published:
+        adjust_category_counter(previous['category_id'], -1)
+    if is_published:
+        adjust_category_counter(instance.category_id, 1)
+
+
+@receiver(post_save, sender=Course)
+def update_search_index_on_save(sender, instance, **kwargs):
+    """
+    Reindexa el curso guardado
+    """
+    get_search_backend().index_courses([instance])
+
+
+@receiver(post_delete, sender=Course)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    """
+    Elimina el curso del índice de búsqueda
+    """
+    get_search_backend().remove_course(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def update_category_counters_on_delete(sender, instance, **kwargs):
+    """
+    Descuenta el curso eliminado del contador de su categoría
+    """
+    if instance.status == 'published':
+        adjust_category_counter(instance.category_id, -1)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_home_on_catalog_change(sender, **kwargs):
+    """
+    Invalida las secciones cacheadas de la portada al cambiar el catálogo
+    """
+    invalidate_home_sections()
+
+
+def _lesson_course_id(module_id):
+    return Module.objects.filter(pk=module_id).values_list('course_id', flat=True).first()
+
+
+@receiver(pre_save, sender=Module)
+def remember_module_course(sender, instance, **kwargs):
+    """
+    Recuerda el curso previo del módulo por si se mueve a otro curso
+    """
+    instance._previous_course_id = None
+    if instance.pk:
+        instance._previous_course_id = (
+            Module.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+        )
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """
+    Recuerda el curso previo de la lección por si cambia de módulo
+    """
+    instance._previous_course_id = None
+    if instance.pk:
+        previous_module_id = Lesson.objects.filter(pk=instance.pk).values_list('module_id', flat=True).first()
+        if previous_module_id and previous_module_id != instance.module_id:
+            instance._previous_course_id = _lesson_course_id(previous_module_id)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_outline_on_module_change(sender, instance, **kwargs):
+    """
+    Publica una nueva versión del temario del curso del módulo
+    """
+    invalidate_course_outline(instance.course_id)
+    previous = getattr(instance, '_previous_course_id', None)
+    if previous != instance.course_id:
+        invalidate_course_outline(previous)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_outline_on_lesson_change(sender, instance, **kwargs):
+    """
+    Publica una nueva versión del temario del curso de la lección
+    """
+    course_id = _lesson_course_id(instance.module_id)
+    invalidate_course_outline(course_id)
+    previous = getattr(instance, '_previous_course_id', None)
+    if previous != course_id:
+        invalidate_course_outline(previous)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summary_on_save(sender, instance, created, **kwargs):
+    """
+    Suma la reseña nueva o la diferencia de valoración al resumen del curso
+    """
+    if not created and not hasattr(instance, '_loaded_rating'):
+        # Sin valoración previa conocida; rebuild_course_ratings lo corrige
+        return
+    old = None if created else instance._loaded_rating
+    apply_rating_change(instance.course_id, old=old, new=int(instance.rating))
+    instance._loaded_rating = int(instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    """
+    Descuenta la reseña eliminada del resumen del curso
+    """
+    apply_rating_change(instance.course_id, old=getattr(instance, '_loaded_rating', instance.rating))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def refresh_entitlements(sender, instance, **kwargs):
+    """
+    Actualiza la caché de cursos del estudiante al inscribirse o darse de baja
+    """
+    # post_delete no envía 'created'; las ediciones de progreso no cambian el conjunto
+    if kwargs.get('created', True):
+        invalidate_enrollments(instance.student_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def forget_progress_state(sender, instance, **kwargs):
+    """
+    Descarta el progreso cacheado de la inscripción eliminada
+    """
+    reset_progress_state(instance.student_id, instance.course_id)
+
+
+@receiver(post_delete, sender=Enrollment)
+def mark_enrollment_stats_dirty(sender, instance, **kwargs):
+    """
+    La baja cambia los agregados del día de inscripción y del de finalización
+    """
+    mark_days_dirty(instance.enrolled_at, instance.completed_at)
@@ -0,0 +1,370 @@
+"""
+Generador de datos sintéticos a gran escala.
+
+Crea catálogo (instructores, cursos, módulos, lecciones) y actividad
+(estudiantes, inscripciones, progreso, reseñas, órdenes y pagos) con
+proporciones realistas y solo con inserciones masivas. Los estudiantes se
+generan en lotes independientes con su propia semilla derivada, así que el
+resultado es el mismo con uno o varios procesos y se puede repartir entre
+workers. Con scale=1 salen unos 400 cursos, 10.000 estudiantes y del orden
+de 300.000 filas de progreso.
+"""
+import multiprocessing
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from payments.models import Order, OrderItem, Payment
+from .models import Category, Course, Enrollment, Lesson, LessonProgress, Module, Review
+
+User = get_user_model()
+
+CATEGORY_NAMES = (
+    'Desarrollo Web', 'Inteligencia Artificial', 'Bases de Datos', 'DevOps', 'Programación', 'Diseño',
+    'Marketing Digital', 'Negocios', 'Ciberseguridad', 'Ciencia de Datos', 'Desarrollo Móvil', 'Fotografía',
+)
+TOPICS = (
+    'Django', 'Python', 'JavaScript', 'React', 'SQL', 'PostgreSQL', 'Docker', 'Kubernetes', 'Machine Learning',
+    'Excel', 'Figma', 'SEO', 'Redes', 'Linux', 'Flutter', 'Pandas', 'Estadística', 'Finanzas', 'Git', 'AWS',
+)
+LEVELS = (('beginner', 'desde cero'), ('intermediate', 'práctico'), ('advanced', 'avanzado'))
+PRICES = (Decimal('9.99'), Decimal('19.99'), Decimal('29.99'), Decimal('49.99'), Decimal('89.99'))
+# Inscripciones por estudiante y sus pesos
+ENROLLMENTS_PER_STUDENT = ((0, 10), (1, 30), (2, 25), (3, 15), (4, 10), (5, 5), (6, 3), (8, 2))
+RATING_WEIGHTS = ((1, 3), (2, 5), (3, 12), (4, 35), (5, 45))
+
+# Volumen por unidad de scale
+INSTRUCTORS_PER_SCALE = 40
+COURSES_PER_SCALE = 400
+STUDENTS_PER_SCALE = 10000
+STUDENTS_PER_CHUNK = 1000
+BATCH_SIZE = 2000
+
+REFUND_RATE = 0.02
+ABANDONED_ORDER_RATE = 0.08
+REVIEW_RATE = 0.3
+EMAIL_DOMAIN = 'synthetic.local'
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Desactiva auto_now/auto_now_add para poder repartir las fechas en el pasado
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _moment_between(rng, start, end):
+    return start + (end - start) * rng.random()
+
+
+class SyntheticDataGenerator:
+    """
+    generator = SyntheticDataGenerator(scale=5, seed=1, days=365)
+    counts = generator.run(workers=4)
+    """
+
+    def __init__(self, scale=1, seed=42, days=365, prefix='syn'):
+        self.scale = scale
+        self.seed = seed
+        self.prefix = prefix
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        self.password = make_password(None)
+        self.catalog = []
+        self.counts = {}
+
+    def exists(self):
+        return User.objects.filter(email__endswith=f'@{self.prefix}.{EMAIL_DOMAIN}').exists()
+
+    def _count(self, name, amount):
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    # --- Catálogo ---
+
+    def create_catalog(self):
+        """
+        Categorías, instructores, cursos, módulos y lecciones (en el proceso principal)
+        """
+        rng = random.Random(f'{self.seed}:catalog')
+        existing = set(Category.objects.filter(name__in=CATEGORY_NAMES).values_list('name', flat=True))
+        Category.objects.bulk_create([
+            Category(name=name, slug=slugify(name), created_at=self.start)
+            for name in CATEGORY_NAMES if name not in existing
+        ])
+        categories = list(Category.objects.filter(name__in=CATEGORY_NAMES))
+
+        instructors = User.objects.bulk_create([
+            User(
+                username=f'{self.prefix}-instructor-{i}', email=f'instructor{i}@{self.prefix}.{EMAIL_DOMAIN}',
+                first_name='Instructor', last_name=f'{i}', password=self.password, is_instructor=True,
+                date_joined=self.start,
+            )
+            for i in range(INSTRUCTORS_PER_SCALE * self.scale)
+        ], batch_size=BATCH_SIZE)
+        self._count('instructors', len(instructors))
+
+        courses = []
+        for i in range(COURSES_PER_SCALE * self.scale):
+            topic = rng.choice(TOPICS)
+            difficulty, label = rng.choice(LEVELS)
+            is_free = rng.random() < 0.08
+            price = Decimal('0') if is_free else rng.choice(PRICES)
+            created_at = _moment_between(rng, self.start, self.now - timedelta(days=1))
+            courses.append(Course(
+                title=f'{topic} {label} {i}', slug=f'{self.prefix}-curso-{i}',
+                short_description=f'Aprende {topic} con proyectos reales',
+                description=f'Curso {label} de {topic}: teoría, ejercicios y un proyecto final.',
+                category=rng.choice(categories), instructor=rng.choice(instructors),
+                thumbnail='courses/thumbnails/synthetic.png', price=price,
+                discount_price=(price * Decimal('0.7')).quantize(Decimal('0.01')) if not is_free and rng.random() < 0.2 else None,
+                difficulty=difficulty, status=rng.choices(('published', 'draft', 'archived'), (85, 10, 5))[0],
+                duration_hours=rng.randint(2, 60), requirements='Ganas de aprender',
+                what_you_learn=f'{topic}, buenas prácticas y despliegue', is_featured=rng.random() < 0.05,
+                is_free=is_free, created_at=created_at, updated_at=created_at,
+            ))
+        courses = Course.objects.bulk_create(courses, batch_size=BATCH_SIZE)
+        self._count('courses', len(courses))
+
+        modules = [
+            Module(course=course, title=f'Módulo {m + 1}', order=m, is_free=m == 0)
+            for course in courses for m in range(rng.randint(4, 8))
+        ]
+        modules = Module.objects.bulk_create(modules, batch_size=BATCH_SIZE)
+        self._count('modules', len(modules))
+
+        lessons = [
+            Lesson(module=module, title=f'Lección {n + 1}', order=n, duration_minutes=rng.randint(3, 25),
+                   lesson_type=rng.choices(('video', 'text', 'quiz'), (80, 15, 5))[0], created_at=module.course.created_at)
+            for module in modules for n in range(rng.randint(3, 7))
+        ]
+        lessons = Lesson.objects.bulk_create(lessons, batch_size=BATCH_SIZE)
+        self._count('lessons', len(lessons))
+
+        lesson_ids = {}
+        for lesson in lessons:
+            lesson_ids.setdefault(lesson.module.course_id, []).append(lesson.pk)
+        # Solo lo que necesitan los workers, para que se serialice barato
+        self.catalog = [
+            (course.pk, course.final_price, course.is_free, course.created_at, lesson_ids.get(course.pk, []))
+            for course in courses if course.status == 'published'
+        ]
+        # El orden del catálogo decide la popularidad de cada curso
+        rng.shuffle(self.catalog)
+
+    # --- Actividad de estudiantes ---
+
+    def chunks(self):
+        total = STUDENTS_PER_SCALE * self.scale
+        return [(start, min(start + STUDENTS_PER_CHUNK, total)) for start in range(0, total, STUDENTS_PER_CHUNK)]
+
+    def create_students_chunk(self, start, end):
+        """
+        Estudiantes [start, end) con toda su actividad; devuelve los conteos
+        """
+        rng = random.Random(f'{self.seed}:students:{start}')
+        catalog = self.catalog
+        # Popularidad sesgada: pocos cursos concentran la mayoría de inscripciones
+        popularity = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(catalog))))
+        sizes, size_weights = zip(*ENROLLMENTS_PER_STUDENT)
+        ratings, rating_weights = zip(*RATING_WEIGHTS)
+
+        plans = []
+        for index in range(start, end):
+            picks = set()
+            for _ in range(rng.choices(sizes, size_weights)[0]):
+                picks.add(bisect(popularity, rng.random() * popularity[-1]))
+            enrollments = []
+            for position in sorted(picks):
+                course_id, price, is_free, course_created, lessons = catalog[min(position, len(catalog) - 1)]
+                enrolled_at = _moment_between(rng, course_created, self.now)
+                done = round(len(lessons) * rng.random() ** 1.5)
+                completed = [
+                    (lesson_id, _moment_between(rng, enrolled_at, self.now)) for lesson_id in lessons[:done]
+                ]
+                finished = bool(lessons) and done == len(lessons)
+                enrollments.append({
+                    'course_id': course_id, 'price': price, 'is_free': is_free, 'enrolled_at': enrolled_at,
+                    'progress': done * 100 // len(lessons) if lessons else 0,
+                    'completed_at': max(moment for _, moment in completed) if finished else None,
+                    'lessons': completed,
+                    'rating': rng.choices(ratings, rating_weights)[0] if done * 3 >= len(lessons) and rng.random() < REVIEW_RATE else None,
+                    'refunded': rng.random() < REFUND_RATE,
+                })
+            enrollments.sort(key=lambda item: item['enrolled_at'])
+            joined = enrollments[0]['enrolled_at'] - timedelta(hours=rng.randint(1, 72)) if enrollments else _moment_between(rng, self.start, self.now)
+            abandoned = None
+            if rng.random() < ABANDONED_ORDER_RATE:
+                abandoned = catalog[bisect(popularity, rng.random() * popularity[-1]) % len(catalog)]
+            plans.append({'index': index, 'joined': max(joined, self.start), 'enrollments': enrollments, 'abandoned': abandoned})
+
+        # Órdenes: compras seguidas se agrupan en la misma orden
+        orders = []
+        for plan in plans:
+            current = None
+            for enrollment in plan['enrollments']:
+                if enrollment['is_free']:
+                    continue
+                if current is None or rng.random() < 0.7:
+                    current = {'plan': plan, 'moment': enrollment['enrolled_at'], 'items': [], 'status': 'completed'}
+                    orders.append(current)
+                else:
+                    enrollment['enrolled_at'] = current['moment']
+                current['items'].append(enrollment)
+            if plan['abandoned']:
+                course_id, price, is_free, course_created, _ = plan['abandoned']
+                if not is_free:
+                    orders.append({
+                        'plan': plan, 'moment': _moment_between(rng, max(course_created, plan['joined']), self.now),
+                        'items': [{'course_id': course_id, 'price': price}], 'status': 'pending',
+                    })
+
+        # Los números de orden se reservan antes de abrir la transacción de inserción
+        from payments.numbering import allocate_order_number
+        for order in orders:
+            order['number'] = allocate_order_number()
+
+        counts = {}
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{self.prefix}-student-{plan["index"]}',
+                    email=f'student{plan["index"]}@{self.prefix}.{EMAIL_DOMAIN}',
+                    first_name='Estudiante', last_name=f'{plan["index"]}', password=self.password,
+                    date_joined=plan['joined'],
+                )
+                for plan in plans
+            ], batch_size=BATCH_SIZE)
+            for plan, user in zip(plans, users):
+                plan['user_id'] = user.pk
+            counts['students'] = len(users)
+
+            enrollment_rows = [(plan, item) for plan in plans for item in plan['enrollments']]
+            created = Enrollment.objects.bulk_create([
+                Enrollment(
+                    student_id=plan['user_id'], course_id=item['course_id'], enrolled_at=item['enrolled_at'],
+                    completed_at=item['completed_at'], progress=item['progress'],
+                )
+                for plan, item in enrollment_rows
+            ], batch_size=BATCH_SIZE)
+            counts['enrollments'] = len(created)
+
+            progress = [
+                LessonProgress(enrollment_id=enrollment.pk, lesson_id=lesson_id, completed=True, completed_at=moment)
+                for enrollment, (_, item) in zip(created, enrollment_rows) for lesson_id, moment in item['lessons']
+            ]
+            LessonProgress.objects.bulk_create(progress, batch_size=BATCH_SIZE)
+            counts['lesson_progress'] = len(progress)
+
+            reviews = [
+                Review(course_id=item['course_id'], student_id=plan['user_id'], rating=item['rating'],
+                       comment='Reseña generada', created_at=_moment_between(rng, item['enrolled_at'], self.now))
+                for plan, item in enrollment_rows if item['rating']
+            ]
+            Review.objects.bulk_create(reviews, batch_size=BATCH_SIZE)
+            counts['reviews'] = len(reviews)
+
+            order_objects = Order.objects.bulk_create([
+                Order(
+                    user_id=order['plan']['user_id'], order_number=order['number'], status=order['status'],
+                    subtotal=sum(item['price'] for item in order['items']),
+                    total_amount=sum(item['price'] for item in order['items']),
+                    created_at=order['moment'],
+                    completed_at=order['moment'] if order['status'] == 'completed' else None,
+                )
+                for order in orders
+            ], batch_size=BATCH_SIZE)
+            counts['orders'] = len(order_objects)
+
+            items, payments = [], []
+            for order, order_object in zip(orders, order_objects):
+                for item in order['items']:
+                    items.append(OrderItem(order_id=order_object.pk, course_id=item['course_id'], price=item['price']))
+                    if order['status'] != 'completed':
+                        continue
+                    payments.append(Payment(
+                        user_id=order_object.user_id, course_id=item['course_id'], payment_method='stripe',
+                        amount=item['price'], status='refunded' if item['refunded'] else 'completed',
+                        stripe_payment_intent_id=f'pi_{self.prefix}_{order["number"]}',
+                        created_at=order['moment'], completed_at=order['moment'],
+                    ))
+            OrderItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+            Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+            counts['order_items'] = len(items)
+            counts['payments'] = len(payments)
+        return counts
+
+    def run(self, workers=1, on_chunk=None):
+        """
+        Genera todo; con workers > 1 los lotes de estudiantes se reparten entre procesos
+        """
+        with explicit_timestamps(User, Category, Course, Lesson, Enrollment, Review, Order, Payment):
+            self.create_catalog()
+            chunks = self.chunks()
+            if workers > 1:
+                # Las conexiones abiertas no deben heredarse en los procesos hijos
+                connections.close_all()
+                context = multiprocessing.get_context('fork')
+                with context.Pool(workers, initializer=_init_worker, initargs=(self,)) as pool:
+                    for counts in pool.imap_unordered(_run_chunk, chunks):
+                        self._merge(counts, on_chunk)
+            else:
+                for chunk in chunks:
+                    self._merge(self.create_students_chunk(*chunk), on_chunk)
+        return self.counts
+
+    def _merge(self, counts, on_chunk):
+        for name, amount in counts.items():
+            self._count(name, amount)
+        if on_chunk:
+            on_chunk(counts)
+
+    def rebuild_derived_data(self):
+        """
+        bulk_create no envía señales: contadores, valoraciones, índice y agregados
+        """
+        from .counters import rebuild_category_counters
+        from .ratings import rebuild_course_ratings
+        from .rollups import backfill_rollups
+        from .search import rebuild_search_index
+
+        rebuild_category_counters()
+        rebuild_course_ratings()
+        rebuild_search_index()
+        backfill_rollups(since=timezone.localdate(self.start))
+
+
+_worker_generator = None
+
+
+def _init_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _run_chunk(chunk):
+    try:
+        with explicit_timestamps(User, Category, Course, Lesson, Enrollment, Review, Order, Payment):
+            return _worker_generator.create_students_chunk(*chunk)
+    finally:
+        connections.close_all()
@@ -0,0 +1,19 @@
+from celery import shared_task
+
+
+@shared_task
+def flush_lesson_progress_task(user_id, course_id):
+    """
+    Vacía el búfer de lecciones completadas de una inscripción
+    """
+    from .progress import flush_lesson_progress
+    return flush_lesson_progress(user_id, course_id)
+
+
+@shared_task
+def update_stats_rollups_task():
+    """
+    Actualiza los agregados diarios del panel de estadísticas
+    """
+    from .rollups import update_rollups
+    return update_rollups()
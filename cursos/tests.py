@@ -1,3 +1,329 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from payments.models import Order, OrderItem, Payment
+from . import progress
+from .entitlements import get_enrolled_course_ids
+from .management.commands.index_advisor import _reject_writes
+from .models import (
+    Category, Course, CourseDailyStats, CourseRating, Enrollment, InstructorDailyStats, Lesson, LessonProgress,
+    Module, Review, StatsDirtyDay,
+)
+from .pagination import KeysetPaginator, decode_cursor
+from .rollups import backfill_rollups
+from .search import search_courses
+
+User = get_user_model()
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='clave-segura',
+        first_name=username.capitalize(), last_name='Prueba', **extra,
+    )
+
+
+def create_course(instructor, category, slug, **extra):
+    fields = {
+        'title': slug.replace('-', ' ').capitalize(), 'description': 'Curso', 'short_description': 'Curso',
+        'price': Decimal('10'), 'status': 'published', 'duration_hours': 1, 'requirements': 'Ninguno',
+        'what_you_learn': 'Lo básico', **extra,
+    }
+    return Course.objects.create(slug=slug, category=category, instructor=instructor, **fields)
+
+
+class LessonProgressTests(TestCase):
+    """
+    El progreso agrupado no pierde lecciones ni retrocede por un estado viejo
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('profesor', is_instructor=True)
+        cls.student = create_user('alumna')
+        category = Category.objects.create(name='Programación', slug='programacion')
+        course = create_course(instructor, category, 'django')
+        module = Module.objects.create(course=course, title='Inicio')
+        cls.lessons = [Lesson.objects.create(module=module, title=f'Lección {order}', order=order) for order in range(4)]
+        cls.course = course
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=course)
+
+    def setUp(self):
+        cache.clear()
+
+    def complete(self, lesson):
+        return progress.record_lesson_completion(self.student, self.course.pk, lesson.pk)
+
+    def test_batching_requires_shared_cache(self):
+        with mock.patch.object(progress, 'PROGRESS_BATCHING', True):
+            with self.assertRaises(ImproperlyConfigured):
+                progress.check_progress_batching()
+
+    def test_stale_cached_state_does_not_lower_progress(self):
+        self.complete(self.lessons[0])
+        # Estado cacheado por otro worker antes de esa lección
+        cache.set(
+            progress._state_key(self.student.pk, self.course.pk),
+            {'enrollment_id': self.enrollment.pk, 'done': set(), 'pending': []}, None,
+        )
+        self.complete(self.lessons[1])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.progress, 50)
+
+    def test_lesson_marked_during_flush_stays_pending(self):
+        bulk_create = LessonProgress.objects.bulk_create
+
+        def mark_another(objs, **kwargs):
+            # Otra petición marca una lección mientras se escribe el lote
+            if len(objs) == 1 and objs[0].lesson_id == self.lessons[0].pk:
+                with mock.patch.object(progress, 'PROGRESS_BATCHING', True), \
+                        mock.patch('cursos.tasks.flush_lesson_progress_task.apply_async'):
+                    self.complete(self.lessons[1])
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(LessonProgress.objects, 'bulk_create', side_effect=mark_another):
+            self.complete(self.lessons[0])
+        state = cache.get(progress._state_key(self.student.pk, self.course.pk))
+        self.assertEqual(state['pending'], [self.lessons[1].pk])
+        self.assertEqual(progress.flush_lesson_progress(self.student.pk, self.course.pk), 1)
+        self.assertEqual(LessonProgress.objects.filter(enrollment=self.enrollment, completed=True).count(), 2)
+
+    def test_complete_lesson_rejects_malformed_body(self):
+        self.client.force_login(self.student)
+        response = self.client.post(reverse('complete_lesson'), 'no es json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_complete_lesson_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.student)
+        response = client.post(
+            reverse('complete_lesson'), {'course_id': self.course.pk, 'lesson_id': self.lessons[0].pk},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class SearchTests(TestCase):
+    """
+    Búsqueda de texto completo: relevancia por campo y sin distinguir acentos
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.in_title = create_course(instructor, category, 'python', title='Programación en Python')
+        cls.in_description = create_course(
+            instructor, category, 'datos', title='Análisis de datos', description='Usaremos programación en Python',
+        )
+        cls.unrelated = create_course(instructor, category, 'diseno', title='Diseño gráfico')
+
+    def test_title_matches_rank_first(self):
+        results = list(search_courses(Course.objects.all(), 'python'))
+        self.assertEqual(results, [self.in_title, self.in_description])
+
+    def test_accents_are_folded(self):
+        self.assertEqual(list(search_courses(Course.objects.all(), 'programacion')), [self.in_title, self.in_description])
+        self.assertEqual(list(search_courses(Course.objects.all(), 'analisis')), [self.in_description])
+
+    def test_prefixes_match_and_syntax_is_ignored(self):
+        self.assertEqual(list(search_courses(Course.objects.all(), 'dise')), [self.unrelated])
+        # Las comillas y el * del lenguaje de FTS5 se descartan
+        self.assertEqual(list(search_courses(Course.objects.all(), 'python" *')), [self.in_title, self.in_description])
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Cursores del catálogo: ida y vuelta entre páginas y cursores alterados
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        created_at = timezone.now()
+        for number in range(5):
+            create_course(instructor, category, f'curso-{number}')
+        # Dos cursos con la misma fecha: desempata el id
+        Course.objects.filter(slug__in=['curso-1', 'curso-2']).update(created_at=created_at)
+        cls.ordered = list(Course.objects.order_by('-created_at', '-id'))
+
+    def paginator(self):
+        return KeysetPaginator(Course.objects.all(), per_page=2)
+
+    def test_next_and_previous_round_trip(self):
+        paginator = self.paginator()
+        pages = [paginator.get_page()]
+        while pages[-1].has_next:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([course for page in pages for course in page], self.ordered)
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginator.get_page(pages[1].previous_cursor)
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertTrue(back.has_next)
+        self.assertFalse(back.has_previous)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        token = self.paginator().get_page().next_cursor
+        tampered = token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')
+        self.assertIsNone(decode_cursor(tampered))
+        page = self.paginator().get_page(tampered)
+        self.assertEqual(list(page), self.ordered[:2])
+        self.assertFalse(page.has_previous)
+
+
+class RatingSummaryTests(TestCase):
+    """
+    El resumen de valoraciones se ajusta al crear, cambiar y borrar reseñas
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.course = create_course(instructor, category, 'django')
+        cls.students = [create_user(f'alumno{number}') for number in range(2)]
+
+    def summary(self):
+        rating = CourseRating.objects.get(course=self.course)
+        return rating.review_count, rating.rating_total, [getattr(rating, f'stars_{value}') for value in range(1, 6)]
+
+    def test_create_update_and_delete(self):
+        Review.objects.create(course=self.course, student=self.students[0], rating=5, comment='Muy bueno')
+        Review.objects.create(course=self.course, student=self.students[1], rating=4, comment='Bueno')
+        self.assertEqual(self.summary(), (2, 9, [0, 0, 0, 1, 1]))
+
+        review = Review.objects.get(student=self.students[0])
+        review.rating = 2
+        review.save()
+        self.assertEqual(self.summary(), (2, 6, [0, 1, 0, 1, 0]))
+
+        review.delete()
+        self.assertEqual(self.summary(), (1, 4, [0, 0, 0, 1, 0]))
+
+
+class EntitlementCacheTests(TestCase):
+    """
+    Los cursos del usuario se leen de caché y se invalidan al inscribirse o
+    darse de baja
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.course = create_course(instructor, category, 'django')
+        cls.student = create_user('alumna')
+
+    def setUp(self):
+        cache.clear()
+
+    def enrolled(self):
+        # Un usuario recién cargado, sin el memo de la petición anterior
+        return get_enrolled_course_ids(User.objects.get(pk=self.student.pk))
+
+    def test_enrollment_create_and_delete_invalidate(self):
+        self.assertEqual(self.enrolled(), frozenset())
+        student = User.objects.get(pk=self.student.pk)
+        with self.assertNumQueries(0):
+            get_enrolled_course_ids(student)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        self.assertEqual(self.enrolled(), {self.course.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.delete()
+        self.assertEqual(self.enrolled(), frozenset())
+
+
+class RollupBackfillTests(TestCase):
+    """
+    La reconstrucción de agregados suma por día, curso e instructor y se
+    puede repetir sin duplicar filas
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = create_user('profesor', is_instructor=True)
+        student = create_user('alumna')
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.django = create_course(cls.instructor, category, 'django', price=Decimal('30'))
+        cls.python = create_course(cls.instructor, category, 'python', price=Decimal('20'))
+        # Mediodía local para no depender de la hora a la que corre la prueba
+        noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        cls.first, cls.second = noon - timedelta(days=2), noon - timedelta(days=1)
+
+        order = Order.objects.create(
+            user=student, order_number='ORD-ROLLUP', status='completed', subtotal=Decimal('50'),
+            total_amount=Decimal('50'), completed_at=cls.first,
+        )
+        for course in (cls.django, cls.python):
+            OrderItem.objects.create(order=order, course=course, price=course.price)
+            Payment.objects.create(
+                user=student, course=course, payment_method='stripe', amount=course.price, status='completed',
+                completed_at=cls.first,
+            )
+        Payment.objects.create(
+            user=student, course=cls.django, payment_method='stripe', amount=Decimal('30'), status='refunded',
+            completed_at=cls.second,
+        )
+        enrollment = Enrollment.objects.create(student=student, course=cls.django)
+        Enrollment.objects.filter(pk=enrollment.pk).update(enrolled_at=cls.first, completed_at=cls.second)
+
+    def setUp(self):
+        cache.clear()
+
+    def course_stats(self, course, moment):
+        stats = CourseDailyStats.objects.get(course=course, day=timezone.localdate(moment))
+        return (stats.revenue, stats.orders, stats.enrollments, stats.completions, stats.refunds, stats.refunded_amount)
+
+    def instructor_stats(self, moment):
+        stats = InstructorDailyStats.objects.get(instructor=self.instructor, day=timezone.localdate(moment))
+        return (stats.revenue, stats.orders, stats.enrollments, stats.completions, stats.refunds, stats.refunded_amount)
+
+    def test_backfill_totals(self):
+        since, until = timezone.localdate(self.first), timezone.localdate(self.second)
+        self.assertEqual(backfill_rollups(since, until, chunk_days=1), 2)
+
+        self.assertEqual(self.course_stats(self.django, self.first), (Decimal('30'), 1, 1, 0, 0, Decimal('0')))
+        self.assertEqual(self.course_stats(self.python, self.first), (Decimal('20'), 1, 0, 0, 0, Decimal('0')))
+        self.assertEqual(self.course_stats(self.django, self.second), (Decimal('0'), 0, 0, 1, 1, Decimal('30')))
+        # La orden con dos cursos del mismo instructor cuenta una sola vez
+        self.assertEqual(self.instructor_stats(self.first), (Decimal('50'), 1, 1, 0, 0, Decimal('0')))
+        self.assertEqual(self.instructor_stats(self.second), (Decimal('0'), 0, 0, 1, 1, Decimal('30')))
+        self.assertFalse(StatsDirtyDay.objects.filter(day__gte=since, day__lte=until).exists())
+
+        backfill_rollups(since, until)
+        self.assertEqual(CourseDailyStats.objects.count(), 3)
+        self.assertEqual(InstructorDailyStats.objects.count(), 2)
+
+
+class IndexAdvisorTests(TestCase):
+    """
+    Durante el análisis las vistas solo pueden leer
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Programación', slug='programacion')
+
+    def test_writes_are_rejected(self):
+        with connection.execute_wrapper(_reject_writes):
+            self.assertEqual(Category.objects.get().slug, 'programacion')
+            with self.assertRaisesMessage(CommandError, 'intentó escribir'), transaction.atomic():
+                Category.objects.create(name='Diseño', slug='diseno')
+            with self.assertRaisesMessage(CommandError, 'intentó escribir'), transaction.atomic():
+                Category.objects.filter(pk=self.category.pk).update(name='Otra')
+        self.assertEqual(Category.objects.count(), 1)
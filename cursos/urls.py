@@ -11,6 +11,7 @@ urlpatterns = [
     path('mis-cursos/', views.my_courses, name='my_courses'),
     path('api/add-to-cart/', views.add_to_cart, name='add_to_cart'),
     path('api/submit-review/', views.submit_review, name='submit_review'),
+    path('api/complete-lesson/', views.complete_lesson, name='complete_lesson'),
 
     # CRUD Cursos
     path('dashboard/cursos/', views.course_list_admin, name='course_list_admin'),
@@ -2,11 +2,20 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
+from django.conf import settings
 from .models import Category, Course, Module, Lesson, Enrollment, Review
 from .forms import CategoryForm
+from .search import search_courses
+from .cache import HOME_CACHE_TIMEOUT
+from .outline import get_course_outline, outline_lessons
+from .pagination import KeysetPaginator, estimate_catalog_count
+from .ratings import RATING_VALUES
+from .entitlements import enrolled_among, is_enrolled as is_enrolled_in
+from .progress import LessonNotInCourse, record_lesson_completion
+from .rollups import instructor_dashboard
 # --- CRUD Categorías ---
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
@@ -45,7 +54,7 @@ def category_delete(request, pk):
         messages.success(request, 'Categoría eliminada correctamente.')
         return redirect('category_list_admin')
     return render(request, 'cursos/category_confirm_delete.html', {'category': category})
-from payments.models import Cart, CartItem
+from payments.cart_store import get_cart_store
 from .forms import CourseForm, ModuleForm, LessonForm
 import json
 
@@ -54,13 +63,16 @@ def home(request):
     """
     Vista principal del sitio
     """
-    featured_courses = Course.objects.filter(status='published', is_featured=True)[:6]
+    # Querysets perezosos: solo se evalúan si el fragmento no está en caché
+    published = Course.objects.filter(status='published').select_related('category', 'instructor')
+    featured_courses = published.filter(is_featured=True)[:6]
     categories = Category.objects.filter(is_active=True)[:8]
-    latest_courses = Course.objects.filter(status='published').order_by('-created_at')[:8]
+    latest_courses = published.order_by('-created_at')[:8]
     context = {
         'featured_courses': featured_courses,
         'categories': categories,
         'latest_courses': latest_courses,
+        'home_cache_timeout': HOME_CACHE_TIMEOUT,
     }
     return render(request, 'cursos/home.html', context)
 
@@ -68,7 +80,7 @@ def course_list(request):
     """
     Lista de cursos con filtros
     """
-    courses = Course.objects.filter(status='published')
+    courses = Course.objects.filter(status='published').select_related('category', 'instructor', 'rating_summary')
     categories = Category.objects.filter(is_active=True)
     
     # Filtros
@@ -83,15 +95,25 @@ def course_list(request):
         courses = courses.filter(difficulty=difficulty)
     
     if search:
-        courses = courses.filter(title__icontains=search)
+        courses = search_courses(courses, search)
     
-    # Paginación
-    paginator = Paginator(courses, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación: por cursor (keyset) si está activada y no hay búsqueda por relevancia
+    keyset = settings.CATALOG_PAGINATION == 'keyset' and not search
+    if keyset:
+        total_count = estimate_catalog_count(courses, category_slug, difficulty)
+        paginator = KeysetPaginator(courses, 12, count=total_count)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(courses, 12)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+        total_count = paginator.count
     
     context = {
         'page_obj': page_obj,
+        'enrolled_course_ids': enrolled_among(request.user, [course.id for course in page_obj]),
+        'keyset': keyset,
+        'total_count': total_count,
         'categories': categories,
         'selected_category': category_slug,
         'selected_difficulty': difficulty,
@@ -103,17 +125,18 @@ def course_detail(request, slug):
     """
     Detalle de un curso
     """
-    course = get_object_or_404(Course, slug=slug, status='published')
-    modules = course.modules.all().order_by('order')
-    reviews = course.reviews.all()[:5]
+    course = get_object_or_404(
+        Course.objects.select_related('category', 'instructor', 'rating_summary'),
+        slug=slug, status='published'
+    )
+    modules = get_course_outline(course.id)
+    reviews = course.reviews.select_related('student')[:5]
     
     # Verificar si el usuario está inscrito
-    is_enrolled = False
-    if request.user.is_authenticated:
-        is_enrolled = Enrollment.objects.filter(student=request.user, course=course).exists()
+    is_enrolled = is_enrolled_in(request.user, course.id)
     
     # Obtener lecciones gratuitas
-    free_lessons = Lesson.objects.filter(module__course=course, is_free=True)
+    free_lessons = [lesson for lesson in outline_lessons(modules) if lesson['is_free']]
     
     context = {
         'course': course,
@@ -136,9 +159,15 @@ def submit_review(request):
         course_id = data.get('course_id')
         rating = data.get('rating')
         comment = data.get('comment')
+        try:
+            rating = int(rating)
+        except (TypeError, ValueError):
+            rating = None
+        if rating not in RATING_VALUES:
+            return JsonResponse({'error': 'La valoración debe estar entre 1 y 5'}, status=400)
         try:
             course = Course.objects.get(id=course_id)
-            if not Enrollment.objects.filter(student=request.user, course=course).exists():
+            if not is_enrolled_in(request.user, course.id):
                 return JsonResponse({'error': 'Debes estar inscrito en el curso para reseñar'}, status=400)
             review, created = Review.objects.update_or_create(
                 course=course,
@@ -157,31 +186,52 @@ def course_player(request, slug):
     Reproductor de curso para estudiantes inscritos
     """
     course = get_object_or_404(Course, slug=slug, status='published')
-    enrollment = get_object_or_404(Enrollment, student=request.user, course=course)
+    if not is_enrolled_in(request.user, course.id):
+        raise Http404('No estás inscrito en este curso')
+    
+    modules = get_course_outline(course.id)
+    lesson_ids = [lesson['id'] for lesson in outline_lessons(modules)]
     
     # Obtener lección actual
     lesson_id = request.GET.get('lesson')
     current_lesson = None
     
     if lesson_id:
-        current_lesson = get_object_or_404(Lesson, id=lesson_id, module__course=course)
-    else:
+        if not lesson_id.isdigit() or int(lesson_id) not in lesson_ids:
+            raise Http404('Lección no encontrada')
+        current_lesson = get_object_or_404(Lesson, id=lesson_id)
+    elif lesson_ids:
         # Primera lección del curso
-        first_module = course.modules.first()
-        if first_module:
-            current_lesson = first_module.lessons.first()
-    
-    modules = course.modules.all().order_by('order')
+        current_lesson = get_object_or_404(Lesson, id=lesson_ids[0])
     
     context = {
         'course': course,
-        'enrollment': enrollment,
         'current_lesson': current_lesson,
         'modules': modules,
     }
     return render(request, 'cursos/course_player.html', context)
 
 @login_required
+def complete_lesson(request):
+    """
+    Marcar una lección como completada
+    """
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            course_id = int(data.get('course_id'))
+            lesson_id = int(data.get('lesson_id'))
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            return JsonResponse({'error': 'Datos no válidos'}, status=400)
+        if not is_enrolled_in(request.user, course_id):
+            return JsonResponse({'error': 'Debes estar inscrito en el curso'}, status=400)
+        try:
+            progress = record_lesson_completion(request.user, course_id, lesson_id)
+        except (LessonNotInCourse, Enrollment.DoesNotExist):
+            return JsonResponse({'error': 'Lección no encontrada'}, status=404)
+        return JsonResponse({'success': True, 'progress': progress})
+    return JsonResponse({'error': 'Método no permitido'}, status=405)
+
 @csrf_exempt
 def add_to_cart(request):
     """
@@ -194,19 +244,18 @@ def add_to_cart(request):
         try:
             course = Course.objects.get(id=course_id, status='published')
             # Verificar si ya está inscrito
-            if Enrollment.objects.filter(student=request.user, course=course).exists():
+            if is_enrolled_in(request.user, course.id):
                 return JsonResponse({'error': 'Ya estás inscrito en este curso'}, status=400)
             # Si el curso es gratis, inscribir automáticamente
             if course.is_free:
+                if not request.user.is_authenticated:
+                    return JsonResponse({'error': 'Inicia sesión para inscribirte en este curso'}, status=401)
                 Enrollment.objects.create(student=request.user, course=course)
                 return JsonResponse({'success': True, 'message': '¡Curso gratis agregado a tus cursos!'})
-            # Obtener o crear carrito
-            cart, created = Cart.objects.get_or_create(user=request.user)
-            # Verificar si ya está en el carrito
-            if CartItem.objects.filter(cart=cart, course=course).exists():
+            # Añadir al carrito (el almacén lo elige CART_STORE)
+            cart = get_cart_store(request, create=True)
+            if not cart.add(course.id):
                 return JsonResponse({'error': 'El curso ya está en tu carrito'}, status=400)
-            # Añadir al carrito
-            CartItem.objects.create(cart=cart, course=course)
             return JsonResponse({'success': True, 'message': 'Curso añadido al carrito'})
         except Course.DoesNotExist:
             return JsonResponse({'error': 'Curso no encontrado'}, status=404)
@@ -218,7 +267,7 @@ def my_courses(request):
     """
     Cursos del usuario
     """
-    enrollments = Enrollment.objects.filter(student=request.user).order_by('-enrolled_at')
+    enrollments = Enrollment.objects.filter(student=request.user).select_related('course__category').order_by('-enrolled_at')
     
     context = {
         'enrollments': enrollments,
@@ -271,7 +320,7 @@ def course_delete(request, pk):
 # --- CRUD Módulos ---
 @login_required
 def module_list(request):
-    modules = Module.objects.all().order_by('order')
+    modules = Module.objects.select_related('course').order_by('order')
     return render(request, 'cursos/module_list.html', {'modules': modules})
 
 @login_required
@@ -310,7 +359,7 @@ def module_delete(request, pk):
 
 @login_required
 def lesson_list(request):
-    lessons = Lesson.objects.all().order_by('order')
+    lessons = Lesson.objects.select_related('module').order_by('order')
     return render(request, 'cursos/lesson_list.html', {'lessons': lessons})
 
 @login_required
@@ -355,9 +404,12 @@ def configurar_pagos(request):
 # --- Estadísticas ---
 @login_required
 def estadisticas(request):
-    ventas_totales = 0  # Aquí puedes poner la lógica real
-    estudiantes_inscritos = 0  # Aquí puedes poner la lógica real
+    # Solo lee los agregados diarios (cursos/rollups.py), nunca pagos ni inscripciones
+    dashboard = instructor_dashboard(request.user)
     return render(request, 'cursos/estadisticas.html', {
-        'ventas_totales': ventas_totales,
-        'estudiantes_inscritos': estudiantes_inscritos,
+        'ventas_totales': dashboard['totals']['revenue'],
+        'estudiantes_inscritos': dashboard['totals']['enrollments'],
+        'totals': dashboard['totals'],
+        'series': dashboard['series'],
+        'course_stats': dashboard['courses'],
     })
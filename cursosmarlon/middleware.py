@@ -0,0 +1,172 @@
+"""
+Middleware de base de datos: instrumentación de consultas SQL por petición
+y enrutado de lecturas a réplicas.
+
+QueryRecorder cuenta las consultas de un bloque de código, su tiempo total y
+las que se repiten con la misma forma (huella), que suelen delatar un N+1.
+QueryBudgetMiddleware lo aplica a cada petición, etiqueta el resultado con
+el nombre de la URL y compara con QUERY_BUDGETS: al superar el presupuesto
+escribe un aviso en el log o, con QUERY_BUDGET_RAISE (pensado para tests),
+lanza QueryBudgetExceeded.
+
+ReplicaRoutingMiddleware decide por vista si las lecturas pueden ir a las
+réplicas (ver cursosmarlon.routers).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .routers import read_from_replicas, replica_aliases, use_replicas
+
+logger = logging.getLogger('cursosmarlon.queries')
+
+# Listas de parámetros de IN (...) de cualquier longitud comparten huella
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+# Literales que a veces llegan incrustados en el SQL (LIMIT/OFFSET, RawSQL)
+NUMBER_RE = re.compile(r'\b\d+\b')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """
+    Forma de la consulta sin valores concretos
+    """
+    sql = STRING_RE.sub('%s', sql)
+    sql = NUMBER_RE.sub('%s', sql)
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """
+    Registra las consultas de todas las conexiones mientras está activo
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.count, recorder.duration, recorder.repeated()
+    """
+
+    def __init__(self, using=None, keep_queries=False):
+        self.using = using
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        # Con keep_queries también se guardan (alias, sql, params) de cada consulta
+        self.queries = [] if keep_queries else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            if self.queries is not None and not many:
+                self.queries.append((context['connection'].alias, sql, params))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        aliases = [self.using] if self.using else list(connections)
+        for alias in aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def repeated(self, threshold=None):
+        """
+        Huellas que se ejecutaron al menos threshold veces, de más a menos
+        """
+        threshold = threshold or getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def get_query_budget(view_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class QueryBudgetMiddleware:
+    """
+    Mide las consultas de cada petición y vigila los presupuestos por vista
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.raise_on_exceeded = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        budget = get_query_budget(view_name)
+        repeated = recorder.repeated()
+        request.query_stats = recorder
+
+        # En las respuestas en streaming solo se cuentan las consultas previas al primer byte
+        response['Server-Timing'] = f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        logger.debug(
+            '%s %s: %d consultas en %.1f ms', request.method, view_name or request.path,
+            recorder.count, recorder.duration * 1000,
+        )
+        if repeated:
+            logger.warning(
+                '%s: consultas repetidas (posible N+1): %s', view_name or request.path,
+                '; '.join(f'{count}x {sql[:200]}' for sql, count in repeated[:3]),
+            )
+        if budget is not None and recorder.count > budget:
+            message = f'{view_name or request.path}: {recorder.count} consultas (presupuesto {budget})'
+            if self.raise_on_exceeded:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+# Cookie que fija al usuario en el primario tras una escritura
+PRIMARY_PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lecturas a réplicas en las vistas de solo lectura de
+    DATABASE_REPLICA_VIEWS, salvo durante unos segundos tras una escritura
+    """
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sticky_seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+
+    def __call__(self, request):
+        with use_replicas(False) as state:
+            response = self.get_response(request)
+        if state.pin:
+            response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        read_from_replicas(self.reads_from_replicas(request))
+
+    def reads_from_replicas(self, request):
+        if request.method not in SAFE_METHODS or PRIMARY_PIN_COOKIE in request.COOKIES:
+            return False
+        view_name = request.resolver_match.view_name
+        return any(fnmatchcase(view_name, pattern) for pattern in settings.DATABASE_REPLICA_VIEWS)
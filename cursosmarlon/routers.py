@@ -0,0 +1,99 @@
+"""
+Enrutado de lecturas a réplicas.
+
+Las escrituras van siempre a `default` (el primario). Las lecturas van a una
+réplica solo dentro de un bloque `use_replicas()`, que ReplicaRoutingMiddleware
+abre en las peticiones GET/HEAD de las vistas de DATABASE_REPLICA_VIEWS
+(catálogo, panel de estadísticas, listados del admin). Fuera de esos bloques
+(resto de vistas, Celery, comandos) se lee del primario.
+
+Los modelos de DATABASE_PRIMARY_ONLY (pagos, carrito, inscripciones,
+sesiones) se leen siempre del primario. Tras escribir en un modelo de
+DATABASE_STICKY_WRITES (pagos, carrito, inscripciones) el middleware fija al
+usuario en el primario durante DATABASE_REPLICA_STICKY_SECONDS para que lea
+lo que acaba de escribir aunque la réplica vaya con retraso. Las demás
+escrituras (la sesión, last_login) no lo fijan; dentro de la misma petición
+cualquier escritura manda al primario las lecturas que siguen.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    def __init__(self, read_from_replicas):
+        self.read_from_replicas = read_from_replicas
+        self.wrote = False
+        self.pin = False
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def is_primary_only(model):
+    primary_only = settings.DATABASE_PRIMARY_ONLY
+    return model._meta.app_label in primary_only or model._meta.label in primary_only
+
+
+def is_sticky_write(model):
+    sticky = settings.DATABASE_STICKY_WRITES
+    return model._meta.app_label in sticky or model._meta.label in sticky
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """
+    Lecturas del bloque a las réplicas; devuelve el estado, que indica si
+    hubo escrituras y si alguna debe fijar al usuario en el primario
+    """
+    state = RoutingState(enabled)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def read_from_replicas(enabled=True):
+    """
+    Cambia el destino de las lecturas del bloque use_replicas() en curso
+    """
+    state = _state.get()
+    if state is not None:
+        state.read_from_replicas = enabled
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if is_primary_only(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        # Los objetos relacionados se leen de la misma base que el objeto de origen
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _state.get()
+        if state is None or not state.read_from_replicas or state.wrote:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.pin = state.pin or is_sticky_write(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación (o con `sync_replicas`)
+        return db == DEFAULT_DB_ALIAS
@@ -11,7 +11,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from cursosmarlon.database import parse_database_url
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cursosmarlon.middleware.QueryBudgetMiddleware',
+    'cursosmarlon.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -90,13 +93,120 @@ WSGI_APPLICATION = 'cursosmarlon.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DATABASE_URL elige el motor (sqlite:///db.sqlite3 por defecto, postgres://... en producción).
+# Conexiones persistentes con comprobación antes de reutilizarlas; con
+# DATABASE_POOL=pgbouncer se conecta a través de PgBouncer en modo transacción.
+DATABASE_POOL = config('DATABASE_POOL', default='')
+# SQLite para varios workers: WAL, espera al bloqueo y transacciones BEGIN IMMEDIATE.
+# Activo por defecto (también en desarrollo, que pasa a usar WAL); SQLITE_PRODUCTION=False
+# vuelve al backend SQLite de Django
+SQLITE_PRODUCTION = config('SQLITE_PRODUCTION', default=True, cast=bool)
+# Solo los PRAGMAs definidos en el entorno: los valores por defecto están en
+# cursosmarlon.sqlite_backend (DEFAULT_PRAGMAS)
+SQLITE_PRAGMAS = {
+    pragma: config(variable, cast=cast)
+    for pragma, variable, cast in (
+        ('busy_timeout', 'SQLITE_BUSY_TIMEOUT', int),
+        ('synchronous', 'SQLITE_SYNCHRONOUS', str),
+        ('mmap_size', 'SQLITE_MMAP_SIZE', int),
+        ('cache_size', 'SQLITE_CACHE_SIZE', int),
+    )
+    if config(variable, default='')
+}
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': parse_database_url(
+        config('DATABASE_URL', default='sqlite:///db.sqlite3'),
+        base_dir=BASE_DIR,
+        conn_max_age=config('CONN_MAX_AGE', default=60, cast=int),
+        conn_health_checks=config('CONN_HEALTH_CHECKS', default=True, cast=bool),
+        pool=DATABASE_POOL,
+        sqlite_pragmas=SQLITE_PRAGMAS if SQLITE_PRODUCTION else None,
+    )
 }
 
+# Réplicas de lectura: una URL por réplica, separadas por comas (alias replica1, replica2...).
+# En local sirve otro fichero SQLite sincronizado con `sync_replicas`.
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{index}'] = {
+        **parse_database_url(
+            url,
+            base_dir=BASE_DIR,
+            conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+            conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+            pool=DATABASE_POOL,
+            sqlite_pragmas=SQLITE_PRAGMAS if SQLITE_PRODUCTION else None,
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['cursosmarlon.routers.PrimaryReplicaRouter']
+# Vistas (nombres de URL, admite comodines) cuyas lecturas van a las réplicas
+DATABASE_REPLICA_VIEWS = [
+    'home',
+    'course_list',
+    'course_detail',
+    'estadisticas',
+    'admin:*_changelist',
+]
+# Modelos (app o app.Modelo) que se leen siempre del primario
+DATABASE_PRIMARY_ONLY = [
+    'payments',
+    'sessions',
+    'cursos.Enrollment',
+    'cursos.LessonProgress',
+]
+# Modelos (app o app.Modelo) cuyas escrituras fijan al usuario en el primario
+DATABASE_STICKY_WRITES = [
+    'payments',
+    'cursos.Enrollment',
+    'cursos.LessonProgress',
+]
+# Segundos que un usuario lee del primario después de escribir
+DATABASE_REPLICA_STICKY_SECONDS = config('DATABASE_REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+# Capacidad de conexiones: procesos y hilos que abren conexión (una por hilo
+# y alias) y el límite: el default_pool_size de PgBouncer con
+# DATABASE_POOL=pgbouncer, que es quien limita las conexiones al servidor, o
+# max_connections del servidor sin pool
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=2, cast=int)
+GUNICORN_THREADS = config('GUNICORN_THREADS', default=1, cast=int)
+CELERY_WORKER_CONCURRENCY = config('CELERY_WORKER_CONCURRENCY', default=2, cast=int)
+DATABASE_POOL_SIZE = config('DATABASE_POOL_SIZE', default=0, cast=int)
+DATABASE_MAX_CONNECTIONS = config('DATABASE_MAX_CONNECTIONS', default=0, cast=int)
+DATABASE_STARTUP_CHECK = config('DATABASE_STARTUP_CHECK', default=True, cast=bool)
+
+
+# Cache
+# Redis si se define REDIS_CACHE_URL; memoria local del proceso en caso contrario
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+HOME_CACHE_TIMEOUT = config('HOME_CACHE_TIMEOUT', default=60 * 15, cast=int)
+
+# Carrito: en caché (se guarda en la base de datos en el checkout) o directamente en la base de datos.
+# La caché solo sirve si es compartida entre workers (Redis)
+CART_STORE = config(
+    'CART_STORE',
+    default='payments.cart_store.CacheCartStore' if REDIS_CACHE_URL else 'payments.cart_store.DatabaseCartStore',
+)
+
+# Paginación del catálogo: 'page' (número de página) o 'keyset' (por cursor)
+CATALOG_PAGINATION = config('CATALOG_PAGINATION', default='page')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -189,6 +299,15 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 # Stripe settings
 STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+STRIPE_WEBHOOK_BATCH_SIZE = config('STRIPE_WEBHOOK_BATCH_SIZE', default=100, cast=int)
+
+# Números de orden: prefijo y tamaño de los bloques que reserva cada proceso
+ORDER_NUMBER_PREFIX = config('ORDER_NUMBER_PREFIX', default='CM')
+ORDER_NUMBER_BLOCK_SIZE = config('ORDER_NUMBER_BLOCK_SIZE', default=100, cast=int)
+
+# Cumplir las órdenes pagadas en un worker de Celery en lugar de en la petición
+PAYMENT_FULFILLMENT_ASYNC = config('PAYMENT_FULFILLMENT_ASYNC', default=False, cast=bool)
 
 # PayPal settings
 PAYPAL_CLIENT_ID = config('PAYPAL_CLIENT_ID', default='')
@@ -202,6 +321,41 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'process-stripe-events': {
+        'task': 'payments.tasks.process_stripe_events_task',
+        'schedule': config('STRIPE_WEBHOOK_POLL_SECONDS', default=5.0, cast=float),
+    },
+    'update-stats-rollups': {
+        'task': 'cursos.tasks.update_stats_rollups_task',
+        'schedule': config('STATS_ROLLUP_INTERVAL_SECONDS', default=600.0, cast=float),
+    },
+}
+
+# Presupuesto de consultas SQL por petición (cursosmarlon/middleware.py)
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=True, cast=bool)
+QUERY_BUDGET_RAISE = config('QUERY_BUDGET_RAISE', default=False, cast=bool)
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=None, cast=lambda v: int(v) if v else None)
+QUERY_BUDGET_REPEAT_THRESHOLD = config('QUERY_BUDGET_REPEAT_THRESHOLD', default=5, cast=int)
+# Máximo de consultas por nombre de URL
+QUERY_BUDGETS = {
+    'home': 8,
+    'course_list': 8,
+    'course_detail': 10,
+    'course_player': 8,
+    'my_courses': 6,
+    'my_orders': 6,
+    'cart': 6,
+    'estadisticas': 6,
+}
+
+# Agregados del panel de estadísticas: días recientes que se recalculan siempre
+STATS_ROLLUP_LOOKBACK_DAYS = config('STATS_ROLLUP_LOOKBACK_DAYS', default=2, cast=int)
+
+# Progreso de lecciones: agrupar escrituras y vaciarlas desde Celery
+LESSON_PROGRESS_BATCHING = config('LESSON_PROGRESS_BATCHING', default=False, cast=bool)
+LESSON_PROGRESS_BATCH_SIZE = config('LESSON_PROGRESS_BATCH_SIZE', default=10, cast=int)
+LESSON_PROGRESS_FLUSH_DELAY = config('LESSON_PROGRESS_FLUSH_DELAY', default=30, cast=int)
 
 # Security settings for production
 if not DEBUG:
@@ -0,0 +1,44 @@
+"""
+Backend SQLite para producción con varios workers.
+
+Igual que el de Django, más:
+- PRAGMAs aplicados al abrir cada conexión (OPTIONS['pragmas']): WAL para que
+  las lecturas no bloqueen a la escritura, busy_timeout para esperar al
+  bloqueo en lugar de fallar con "database is locked", synchronous=NORMAL
+  (seguro con WAL), mmap y caché de páginas.
+- Transacciones que toman el bloqueo de escritura al empezar
+  (OPTIONS['transaction_mode'], IMMEDIATE por defecto). Con BEGIN diferido,
+  una transacción que lee y luego escribe no puede esperar al bloqueo y
+  SQLite falla en el acto aunque haya busy_timeout.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    # Negativo: en KiB (64 MiB)
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ValueError(f'transaction_mode no válido: {self.transaction_mode}')
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
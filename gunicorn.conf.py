@@ -0,0 +1,15 @@
+"""
+Configuración de gunicorn (ver Procfile)
+"""
+
+
+def post_worker_init(worker):
+    """
+    Comprobación de capacidad de la base de datos, una vez por arranque: en
+    el primer worker, ya con Django cargado, y nunca en el proceso maestro
+    """
+    if worker.age != 1:
+        return
+    from cursosmarlon.database import report_pool_saturation
+
+    report_pool_saturation()
@@ -1,28 +1,48 @@
 from django.contrib import admin
-from .models import Payment, Cart, CartItem, Coupon, Order, OrderItem
+from cursos.admin_utils import AutocompleteFilter, AutocompleteFilterMixin, EstimatedCountPaginator
+from .models import Payment, Cart, CartItem, Coupon, CouponRedemption, Order, OrderItem, StripeEvent
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('user', 'course', 'amount', 'payment_method', 'status', 'created_at')
-    list_filter = ('payment_method', 'status', 'created_at')
+    list_filter = ('payment_method', 'status', 'created_at', ('course', AutocompleteFilter))
     search_fields = ('user__first_name', 'user__last_name', 'course__title', 'transaction_id')
     readonly_fields = ('created_at', 'transaction_id', 'stripe_payment_intent_id', 'paypal_order_id')
+    list_select_related = ('user', 'course')
+    autocomplete_fields = ('user', 'course')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
+    autocomplete_fields = ('course',)
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_items', 'total_amount', 'created_at')
     search_fields = ('user__first_name', 'user__last_name')
     readonly_fields = ('created_at', 'updated_at')
+    autocomplete_fields = ('user',)
     inlines = [CartItemInline]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals().select_related('user')
+    
+    @admin.display(description='Items', ordering='items_count')
+    def total_items(self, obj):
+        return obj.total_items
+    
+    @admin.display(description='Total', ordering='items_total')
+    def total_amount(self, obj):
+        return obj.total_amount
 
 @admin.register(CartItem)
 class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'course', 'added_at')
     search_fields = ('cart__user__first_name', 'cart__user__last_name', 'course__title')
+    list_select_related = ('cart__user', 'course')
+    autocomplete_fields = ('cart', 'course')
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
@@ -31,10 +51,20 @@ class CouponAdmin(admin.ModelAdmin):
     search_fields = ('code', 'description')
     readonly_fields = ('used_count', 'created_at')
 
+@admin.register(CouponRedemption)
+class CouponRedemptionAdmin(admin.ModelAdmin):
+    list_display = ('coupon', 'order', 'user', 'discount_amount', 'redeemed_at')
+    search_fields = ('coupon__code', 'order__order_number')
+    readonly_fields = ('coupon', 'order', 'user', 'discount_amount', 'redeemed_at')
+    list_select_related = ('coupon', 'order__user', 'user')
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ('course', 'price')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('course')
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -42,9 +72,29 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('order_number', 'user__first_name', 'user__last_name')
     readonly_fields = ('order_number', 'created_at')
+    autocomplete_fields = ('user', 'coupon')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [OrderItemInline]
+    
+    def get_queryset(self, request):
+        # También lo usa la vista de autocompletado, que muestra str(obj)
+        return super().get_queryset(request).select_related('user')
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('order', 'course', 'price')
+    list_filter = (('course', AutocompleteFilter),)
     search_fields = ('order__order_number', 'course__title')
+    list_select_related = ('order__user', 'course')
+    autocomplete_fields = ('order', 'course')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'event_type', 'payload', 'attempts', 'last_error', 'received_at', 'processed_at')
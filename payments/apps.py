@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+        from .cart_store import check_cart_store
+
+        check_cart_store()
+        post_migrate.connect(signals.ensure_order_number_sequence, sender=self)
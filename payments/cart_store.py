@@ -0,0 +1,269 @@
+"""
+Almacenamiento del carrito de compras.
+
+Con una caché compartida (Redis) el carrito vive en la caché
+(CacheCartStore) y solo se escribe en Cart/CartItem al pasar por el
+checkout. DatabaseCartStore conserva el comportamiento clásico y es el
+backend por defecto con la caché local, que cada worker tiene por separado
+y pierde al reiniciar. El backend se elige con el ajuste CART_STORE;
+CacheCartStore con una caché local se rechaza al arrancar.
+
+Los visitantes anónimos tienen un carrito identificado por un token guardado
+en la sesión, que se fusiona con el del usuario al iniciar sesión. Sin
+caché compartida, el carrito anónimo se guarda en la propia sesión.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from cursos.cache import cache_lock, is_shared_cache
+from cursos.models import Course
+from .models import Cart, CartItem
+
+CART_SESSION_KEY = 'cart_token'
+CART_SESSION_COURSES_KEY = 'cart_course_ids'
+CART_CACHE_ALIAS = getattr(settings, 'CART_CACHE_ALIAS', 'default')
+CART_CACHE_TIMEOUT = getattr(settings, 'CART_CACHE_TIMEOUT', 60 * 60 * 24 * 30)
+ANONYMOUS_CART_TIMEOUT = getattr(settings, 'ANONYMOUS_CART_TIMEOUT', 60 * 60 * 24 * 7)
+
+
+class CacheCartStore:
+    """
+    Carrito en la caché: lista ordenada de IDs de curso. Las modificaciones
+    leen y reescriben la lista con el carrito bloqueado (cache.add de una
+    clave de bloqueo), así dos peticiones a la vez no se pisan
+    """
+
+    def __init__(self, owner, user_id=None):
+        self.key = f'cart:{owner}'
+        self.lock_key = f'{self.key}:lock'
+        self.user_id = user_id
+        self.cache = caches[CART_CACHE_ALIAS]
+        self.timeout = CART_CACHE_TIMEOUT if user_id else ANONYMOUS_CART_TIMEOUT
+
+    def _locked(self):
+        return cache_lock(self.lock_key, using=self.cache)
+
+    def course_ids(self):
+        course_ids = self.cache.get(self.key)
+        if course_ids is None:
+            course_ids = []
+            if self.user_id:
+                # Primera lectura: partir de lo guardado en el último checkout
+                course_ids = list(
+                    CartItem.objects.filter(cart__user_id=self.user_id)
+                    .order_by('added_at')
+                    .values_list('course_id', flat=True)
+                )
+            # Si otra petición ya lo ha cargado, vale lo que haya en la caché
+            if not self.cache.add(self.key, course_ids, self.timeout):
+                course_ids = self.cache.get(self.key, course_ids)
+        return course_ids
+
+    def _save(self, course_ids):
+        self.cache.set(self.key, course_ids, self.timeout)
+
+    def add(self, course_id):
+        with self._locked():
+            course_ids = self.course_ids()
+            if course_id in course_ids:
+                return False
+            self._save(course_ids + [course_id])
+        return True
+
+    def remove(self, course_id):
+        return self.remove_many([course_id]) > 0
+
+    def remove_many(self, course_ids):
+        with self._locked():
+            current = self.course_ids()
+            remaining = [course_id for course_id in current if course_id not in set(course_ids)]
+            if len(remaining) != len(current):
+                self._save(remaining)
+        return len(current) - len(remaining)
+
+    def clear(self):
+        with self._locked():
+            self._save([])
+
+    def delete(self):
+        self.cache.delete(self.key)
+
+
+class SessionCartStore:
+    """
+    Carrito anónimo en la sesión, cuando la caché no es compartida
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def course_ids(self):
+        return list(self.session.get(CART_SESSION_COURSES_KEY, []))
+
+    def _save(self, course_ids):
+        self.session[CART_SESSION_COURSES_KEY] = course_ids
+
+    def add(self, course_id):
+        course_ids = self.course_ids()
+        if course_id in course_ids:
+            return False
+        self._save(course_ids + [course_id])
+        return True
+
+    def remove(self, course_id):
+        return self.remove_many([course_id]) > 0
+
+    def remove_many(self, course_ids):
+        current = self.course_ids()
+        remaining = [course_id for course_id in current if course_id not in set(course_ids)]
+        if len(remaining) != len(current):
+            self._save(remaining)
+        return len(current) - len(remaining)
+
+    def clear(self):
+        self._save([])
+
+    def delete(self):
+        self.session.pop(CART_SESSION_COURSES_KEY, None)
+
+
+class DatabaseCartStore:
+    """
+    Carrito en las tablas Cart/CartItem (una escritura por operación)
+    """
+
+    def __init__(self, owner, user_id=None):
+        if user_id is None:
+            raise ValueError('DatabaseCartStore solo admite usuarios autenticados')
+        self.user_id = user_id
+
+    def course_ids(self):
+        return list(
+            CartItem.objects.filter(cart__user_id=self.user_id).order_by('added_at').values_list('course_id', flat=True)
+        )
+
+    def add(self, course_id):
+        cart, created = Cart.objects.get_or_create(user_id=self.user_id)
+        item, created = CartItem.objects.get_or_create(cart=cart, course_id=course_id)
+        return created
+
+    def remove(self, course_id):
+        return self.remove_many([course_id]) > 0
+
+    def remove_many(self, course_ids):
+        deleted, _ = CartItem.objects.filter(cart__user_id=self.user_id, course_id__in=course_ids).delete()
+        return deleted
+
+    def clear(self):
+        CartItem.objects.filter(cart__user_id=self.user_id).delete()
+
+    def delete(self):
+        self.clear()
+
+
+def _store_class():
+    default = 'CacheCartStore' if is_shared_cache(CART_CACHE_ALIAS) else 'DatabaseCartStore'
+    return import_string(getattr(settings, 'CART_STORE', f'payments.cart_store.{default}'))
+
+
+def check_cart_store():
+    """
+    Comprobación de arranque: CacheCartStore necesita una caché compartida
+    """
+    if issubclass(_store_class(), CacheCartStore) and not is_shared_cache(CART_CACHE_ALIAS):
+        raise ImproperlyConfigured(
+            'CART_STORE=CacheCartStore necesita una caché compartida (REDIS_CACHE_URL): con la caché '
+            'local cada worker tendría sus propios carritos y se perderían al reiniciar'
+        )
+
+
+def get_user_cart_store(user_id):
+    return _store_class()(f'user:{user_id}', user_id=user_id)
+
+
+def get_anonymous_cart_store(request, create=False):
+    """
+    Carrito anónimo de la sesión: en la caché si es compartida y si no en la
+    propia sesión. None si aún no tiene carrito y create es False.
+    """
+    session = request.session
+    if not is_shared_cache(CART_CACHE_ALIAS):
+        if CART_SESSION_COURSES_KEY not in session and not create:
+            return None
+        return SessionCartStore(session)
+    token = session.get(CART_SESSION_KEY)
+    if token is None:
+        if not create:
+            return None
+        token = uuid.uuid4().hex
+        session[CART_SESSION_KEY] = token
+    return CacheCartStore(f'anon:{token}')
+
+
+def get_cart_store(request, create=False):
+    """
+    Carrito del usuario o, para anónimos, el asociado a su sesión.
+    Devuelve None si el anónimo aún no tiene carrito y create es False.
+    """
+    if request.user.is_authenticated:
+        return get_user_cart_store(request.user.pk)
+    return get_anonymous_cart_store(request, create=create)
+
+
+def merge_anonymous_cart(request, user):
+    """
+    Pasa el carrito anónimo de la sesión al del usuario que inicia sesión
+    """
+    anonymous = get_anonymous_cart_store(request)
+    request.session.pop(CART_SESSION_KEY, None)
+    if anonymous is None:
+        return 0
+    store = get_user_cart_store(user.pk)
+    added = sum(store.add(course_id) for course_id in anonymous.course_ids())
+    anonymous.delete()
+    return added
+
+
+class CartContents:
+    """
+    Contenido del carrito listo para las plantillas
+    """
+
+    def __init__(self, courses):
+        # Items sin guardar: solo sirven para que la plantilla lea item.course
+        self.items = [CartItem(course=course) for course in courses]
+        self.total_amount = sum((course.final_price for course in courses), 0)
+        self.total_items = len(courses)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def get_cart_contents(store):
+    course_ids = store.course_ids() if store else []
+    courses = Course.objects.filter(pk__in=course_ids).select_related('category', 'instructor')
+    by_id = {course.pk: course for course in courses}
+    return CartContents([by_id[course_id] for course_id in course_ids if course_id in by_id])
+
+
+def persist_cart(user_id):
+    """
+    Escribe el carrito en Cart/CartItem (solo en el checkout) y devuelve el Cart
+    """
+    course_ids = get_user_cart_store(user_id).course_ids()
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user_id=user_id)
+        stored = set(CartItem.objects.filter(cart=cart).values_list('course_id', flat=True))
+        wanted = set(course_ids)
+        if stored - wanted:
+            CartItem.objects.filter(cart=cart, course_id__in=stored - wanted).delete()
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, course_id=course_id) for course_id in course_ids if course_id not in stored],
+            ignore_conflicts=True,
+        )
+    return cart
@@ -0,0 +1,124 @@
+"""
+Canje de cupones seguro ante concurrencia.
+
+La validez de cada cupón se cachea para rechazar códigos inválidos o
+caducados sin consultar la base de datos. El canje incrementa `used_count`
+con un UPDATE condicional (nunca supera `usage_limit`) y registra el uso en
+CouponRedemption, cuya restricción única impide canjear dos veces la misma orden.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Coupon, CouponRedemption, Order
+
+COUPON_CACHE_TIMEOUT = getattr(settings, 'COUPON_CACHE_TIMEOUT', 60 * 5)
+# Los códigos inexistentes se recuerdan menos tiempo
+MISSING_COUPON_TIMEOUT = 60
+MISSING = 'missing'
+
+
+class CouponError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _cache_key(code):
+    # El código lo escribe el usuario: se resume para obtener una clave segura
+    return f'coupon:{hashlib.md5(code.encode()).hexdigest()}'
+
+
+def get_coupon_record(code):
+    """
+    Datos de validez del cupón desde caché, o None si no existe
+    """
+    key = _cache_key(code)
+    record = cache.get(key)
+    if record is None:
+        coupon = Coupon.objects.filter(code=code).first()
+        if coupon is None:
+            cache.set(key, MISSING, MISSING_COUPON_TIMEOUT)
+            return None
+        record = {
+            'id': coupon.pk,
+            'discount_type': coupon.discount_type,
+            'discount_value': coupon.discount_value,
+            'minimum_amount': coupon.minimum_amount,
+            'is_active': coupon.is_active,
+            'valid_from': coupon.valid_from,
+            'valid_to': coupon.valid_to,
+            'exhausted': coupon.usage_limit is not None and coupon.used_count >= coupon.usage_limit,
+        }
+        cache.set(key, record, COUPON_CACHE_TIMEOUT)
+    return None if record == MISSING else record
+
+
+def invalidate_coupon(code):
+    cache.delete(_cache_key(code))
+
+
+def _mark_exhausted(code, record):
+    record['exhausted'] = True
+    cache.set(_cache_key(code), record, COUPON_CACHE_TIMEOUT)
+
+
+def calculate_discount(record, subtotal):
+    if record['discount_type'] == 'percentage':
+        discount = subtotal * (record['discount_value'] / 100)
+    else:
+        discount = record['discount_value']
+    return min(discount, subtotal).quantize(Decimal('0.01'))
+
+
+def redeem_coupon(code, order):
+    """
+    Canjea el cupón para la orden y devuelve el descuento aplicado
+    """
+    record = get_coupon_record(code)
+    if record is None:
+        raise CouponError('Cupón no encontrado', status=404)
+    now = timezone.now()
+    if not record['is_active'] or record['exhausted'] or not record['valid_from'] <= now <= record['valid_to']:
+        raise CouponError('Cupón no válido o expirado')
+    if order.status != 'pending':
+        raise CouponError('La orden ya no admite cupones')
+    if order.coupon_id:
+        raise CouponError('La orden ya tiene un cupón aplicado')
+    if order.subtotal < record['minimum_amount']:
+        raise CouponError(f'El monto mínimo para este cupón es ${record["minimum_amount"]}')
+
+    discount = calculate_discount(record, order.subtotal)
+    try:
+        with transaction.atomic():
+            # Incremento atómico condicionado a que quede cupo y siga vigente
+            claimed = Coupon.objects.filter(
+                Q(usage_limit__isnull=True) | Q(used_count__lt=F('usage_limit')),
+                pk=record['id'],
+                is_active=True,
+                valid_from__lte=now,
+                valid_to__gte=now,
+            ).update(used_count=F('used_count') + 1)
+            if not claimed:
+                _mark_exhausted(code, record)
+                raise CouponError('Cupón no válido o expirado')
+            CouponRedemption.objects.create(
+                coupon_id=record['id'], order=order, user_id=order.user_id, discount_amount=discount
+            )
+            Order.objects.filter(pk=order.pk).update(
+                coupon_id=record['id'],
+                discount_amount=discount,
+                total_amount=order.subtotal - discount,
+            )
+    except IntegrityError:
+        raise CouponError('La orden ya tiene un cupón aplicado')
+    order.coupon_id = record['id']
+    order.discount_amount = discount
+    order.total_amount = order.subtotal - discount
+    return discount
@@ -0,0 +1,217 @@
+"""
+Exportación en streaming de pagos, órdenes e inscripciones (CSV o JSONL).
+
+Las filas se leen por bloques de chunk_size ordenados por clave primaria
+(pk > última leída, sin OFFSET) y se escriben una a una: la memoria es
+constante aunque se exporten millones de filas, también detrás de PgBouncer,
+donde no hay cursores del lado del servidor e iterator() traería todo el
+resultado de una vez. La misma función alimenta la vista
+(StreamingHttpResponse) y el comando `export_data`.
+
+Las exportaciones de un instructor solo contienen filas de sus cursos: las
+órdenes se exportan como sus líneas (OrderItem), sin los totales ni el
+cupón de la orden, que incluyen cursos de otros instructores.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from cursos.models import Enrollment
+from .models import Order, OrderItem, Payment
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+class Export:
+    """
+    Definición de un conjunto exportable: columnas (nombre, campo) y los
+    campos por los que se filtra por fecha e instructor. instructor_export
+    sustituye al conjunto cuando se filtra por instructor.
+    """
+
+    def __init__(self, model, columns, date_field, instructor_filter=None, instructor_export=None):
+        self.model = model
+        self.columns = columns
+        self.date_field = date_field
+        self.instructor_filter = instructor_filter
+        self.instructor_export = instructor_export
+
+    def for_instructor(self):
+        return self.instructor_export or self
+
+    @property
+    def headers(self):
+        return [name for name, _ in self.columns]
+
+    def queryset(self, since=None, until=None, instructor_id=None):
+        queryset = self.model.objects.all()
+        if since:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': _start_of_day(since)})
+        if until:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': _start_of_day(until + timedelta(days=1))})
+        if instructor_id is not None:
+            queryset = self.instructor_filter(queryset, instructor_id)
+        # La clave primaria va primero: ordena y marca dónde empieza el siguiente bloque
+        return queryset.order_by('pk').values_list('pk', *[field for _, field in self.columns])
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def _by_course_instructor(queryset, instructor_id):
+    return queryset.filter(course__instructor_id=instructor_id)
+
+
+def _keyset_rows(queryset, chunk_size):
+    """
+    Filas de un values_list('pk', ...) ordenado por pk, un bloque por consulta
+    """
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+# Órdenes vistas por un instructor: solo las líneas de sus cursos
+INSTRUCTOR_ORDERS = Export(
+    OrderItem,
+    [
+        ('id', 'order_id'),
+        ('order_number', 'order__order_number'),
+        ('created_at', 'order__created_at'),
+        ('completed_at', 'order__completed_at'),
+        ('status', 'order__status'),
+        ('user_email', 'order__user__email'),
+        ('course_id', 'course_id'),
+        ('course_title', 'course__title'),
+        ('price', 'price'),
+    ],
+    'order__created_at',
+    _by_course_instructor,
+)
+
+EXPORTS = {
+    'payments': Export(
+        Payment,
+        [
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('completed_at', 'completed_at'),
+            ('status', 'status'),
+            ('payment_method', 'payment_method'),
+            ('amount', 'amount'),
+            ('currency', 'currency'),
+            ('user_email', 'user__email'),
+            ('course_id', 'course_id'),
+            ('course_title', 'course__title'),
+            ('instructor_email', 'course__instructor__email'),
+            ('transaction_id', 'transaction_id'),
+            ('stripe_payment_intent_id', 'stripe_payment_intent_id'),
+        ],
+        'created_at',
+        _by_course_instructor,
+    ),
+    'orders': Export(
+        Order,
+        [
+            ('id', 'id'),
+            ('order_number', 'order_number'),
+            ('created_at', 'created_at'),
+            ('completed_at', 'completed_at'),
+            ('status', 'status'),
+            ('user_email', 'user__email'),
+            ('subtotal', 'subtotal'),
+            ('discount_amount', 'discount_amount'),
+            ('total_amount', 'total_amount'),
+            ('coupon_code', 'coupon__code'),
+        ],
+        'created_at',
+        instructor_export=INSTRUCTOR_ORDERS,
+    ),
+    'order_items': Export(
+        OrderItem,
+        [
+            ('id', 'id'),
+            ('order_number', 'order__order_number'),
+            ('order_created_at', 'order__created_at'),
+            ('order_status', 'order__status'),
+            ('user_email', 'order__user__email'),
+            ('course_id', 'course_id'),
+            ('course_title', 'course__title'),
+            ('instructor_email', 'course__instructor__email'),
+            ('price', 'price'),
+        ],
+        'order__created_at',
+        _by_course_instructor,
+    ),
+    'enrollments': Export(
+        Enrollment,
+        [
+            ('id', 'id'),
+            ('enrolled_at', 'enrolled_at'),
+            ('completed_at', 'completed_at'),
+            ('progress', 'progress'),
+            ('student_email', 'student__email'),
+            ('course_id', 'course_id'),
+            ('course_title', 'course__title'),
+            ('instructor_email', 'course__instructor__email'),
+        ],
+        'enrolled_at',
+        _by_course_instructor,
+    ),
+}
+
+
+class _Echo:
+    """
+    Pseudo-fichero para csv.writer: devuelve la línea en lugar de guardarla
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_export(dataset, export_format='csv', since=None, until=None, instructor_id=None, chunk_size=None):
+    """
+    Generador con las líneas de la exportación, cabecera incluida en CSV
+    """
+    if dataset not in EXPORTS:
+        raise ExportError(f'Conjunto desconocido: {dataset}')
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f'Formato desconocido: {export_format}')
+    export = EXPORTS[dataset]
+    if instructor_id is not None:
+        export = export.for_instructor()
+    rows = _keyset_rows(export.queryset(since, until, instructor_id), chunk_size or EXPORT_CHUNK_SIZE)
+    headers = export.headers
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def export_filename(dataset, export_format):
+    return f'{dataset}-{timezone.localdate().isoformat()}.{export_format}'
@@ -0,0 +1,82 @@
+"""
+Cumplimiento de órdenes pagadas: pagos, inscripciones y limpieza del carrito.
+
+Todo se escribe con inserciones masivas dentro de una única transacción y
+es idempotente por `stripe_payment_intent_id`: volver a procesar el mismo
+Payment Intent no duplica pagos ni inscripciones.
+"""
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from cursos.entitlements import invalidate_enrollments
+from cursos.models import Enrollment
+from .cart_store import get_user_cart_store
+from .models import CartItem, Order, Payment
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+
+
+class PaymentNotSucceeded(Exception):
+    pass
+
+
+def verify_payment_intent(order, payment_intent_id):
+    """
+    Comprueba con Stripe que el Payment Intent está pagado y es de la orden
+    """
+    intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+    metadata_order_id = (intent.get('metadata') or {}).get('order_id')
+    if intent.status != 'succeeded' or (metadata_order_id and str(metadata_order_id) != str(order.id)):
+        raise PaymentNotSucceeded(payment_intent_id)
+    return intent
+
+
+def fulfill_order(order_id, payment_intent_id, payment_method='stripe'):
+    """
+    Registra los pagos e inscripciones de una orden pagada.
+    Devuelve True si se completó ahora y False si ya estaba completada.
+    """
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order_id)
+        if order.status == 'completed' or Payment.objects.filter(stripe_payment_intent_id=payment_intent_id).exists():
+            return False
+
+        now = timezone.now()
+        items = list(order.items.values_list('course_id', 'price'))
+        course_ids = [course_id for course_id, _ in items]
+        Payment.objects.bulk_create([
+            Payment(
+                user_id=order.user_id,
+                course_id=course_id,
+                payment_method=payment_method,
+                amount=price,
+                status='completed',
+                stripe_payment_intent_id=payment_intent_id,
+                completed_at=now,
+            )
+            for course_id, price in items
+        ])
+        Enrollment.objects.bulk_create(
+            [Enrollment(student_id=order.user_id, course_id=course_id) for course_id in course_ids],
+            ignore_conflicts=True,
+        )
+        Order.objects.filter(pk=order.pk).update(status='completed', completed_at=now)
+        # Solo se retiran del carrito los cursos comprados
+        CartItem.objects.filter(cart__user_id=order.user_id, course_id__in=course_ids).delete()
+        transaction.on_commit(lambda: get_user_cart_store(order.user_id).remove_many(course_ids))
+        # bulk_create no envía señales: refrescar la caché de inscripciones
+        invalidate_enrollments(order.user_id)
+    return True
+
+
+def confirm_and_fulfill(order_id, payment_intent_id):
+    """
+    Verifica el pago con Stripe y cumple la orden
+    """
+    order = Order.objects.get(pk=order_id)
+    if order.status == 'completed':
+        return False
+    verify_payment_intent(order, payment_intent_id)
+    return fulfill_order(order.pk, payment_intent_id)
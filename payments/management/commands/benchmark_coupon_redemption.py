@@ -0,0 +1,80 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from payments.coupons import CouponError, redeem_coupon
+from payments.models import Coupon, CouponRedemption, Order
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Medir canjes concurrentes de un cupón y comprobar que los contadores son correctos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--redemptions', type=int, default=2000, help='Intentos de canje')
+        parser.add_argument('--limit', type=int, default=1000, help='usage_limit del cupón de prueba')
+        parser.add_argument('--workers', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--keep', action='store_true', help='No borrar los datos de prueba')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        now = timezone.now()
+        user = User.objects.create_user(
+            username=f'bench-{tag}', email=f'bench-{tag}@example.com', password=None,
+            first_name='Bench', last_name='Coupon',
+        )
+        coupon = Coupon.objects.create(
+            code=f'BENCH-{tag}', description='Cupón de benchmark', discount_type='percentage',
+            discount_value=Decimal('10'), usage_limit=options['limit'],
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+        orders = Order.objects.bulk_create([
+            Order(user=user, order_number=f'B{tag[:4]}{i:06d}', subtotal=Decimal('100'), total_amount=Decimal('100'))
+            for i in range(options['redemptions'])
+        ])
+        orders = list(Order.objects.filter(user=user))
+
+        def redeem(order):
+            try:
+                redeem_coupon(coupon.code, order)
+                return 'ok'
+            except CouponError:
+                return 'rejected'
+            except Exception:
+                return 'error'
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(redeem, orders))
+        elapsed = time.perf_counter() - started
+
+        coupon.refresh_from_db()
+        ledger = CouponRedemption.objects.filter(coupon=coupon).count()
+        accepted = results.count('ok')
+        expected = min(options['limit'], len(orders))
+        correct = coupon.used_count == ledger == accepted == expected
+        rate = len(orders) / elapsed if elapsed else 0
+
+        self.stdout.write(
+            f'Intentos: {len(orders)}  aceptados: {accepted}  rechazados: {results.count("rejected")}  '
+            f'errores: {results.count("error")}\n'
+            f'used_count: {coupon.used_count}  registro: {ledger}  esperado: {expected}\n'
+            f'Tiempo: {elapsed:.2f}s  ({rate:.0f} canjes/s con {options["workers"]} hilos)'
+        )
+        if not options['keep']:
+            user.delete()
+            coupon.delete()
+        if correct:
+            self.stdout.write(self.style.SUCCESS('Contadores correctos'))
+        else:
+            self.stdout.write(self.style.ERROR('Contadores incorrectos'))
@@ -0,0 +1,45 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _allocate(count):
+    from payments.numbering import allocate_order_number
+
+    numbers = [allocate_order_number() for _ in range(count)]
+    connections.close_all()
+    return numbers
+
+
+class Command(BaseCommand):
+    help = 'Medir la asignación de números de orden en varios procesos y buscar colisiones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--per-worker', type=int, default=10000, help='Números por proceso')
+        parser.add_argument('--workers', type=int, default=4, help='Procesos concurrentes (como workers de gunicorn)')
+
+    def handle(self, *args, **options):
+        workers, per_worker = options['workers'], options['per_worker']
+        # Las conexiones abiertas no deben heredarse en los procesos hijos
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        started = time.perf_counter()
+        with context.Pool(workers) as pool:
+            results = pool.map(_allocate, [per_worker] * workers)
+        elapsed = time.perf_counter() - started
+
+        numbers = [number for result in results for number in result]
+        duplicates = len(numbers) - len(set(numbers))
+        ordered = all(result == sorted(result) for result in results)
+        rate = len(numbers) / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Números: {len(numbers)}  duplicados: {duplicates}  crecientes por proceso: {"sí" if ordered else "no"}\n'
+            f'Ejemplos: {numbers[0]} … {numbers[-1]}\n'
+            f'Tiempo: {elapsed:.2f}s  ({rate:.0f} números/s con {workers} procesos)'
+        )
+        if duplicates:
+            self.stdout.write(self.style.ERROR('Se encontraron colisiones'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin colisiones'))
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from payments.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Exportar pagos, órdenes o inscripciones en CSV o JSONL sin cargarlos en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--since', help='Primer día (AAAA-MM-DD)')
+        parser.add_argument('--until', help='Último día (AAAA-MM-DD)')
+        parser.add_argument('--instructor', type=int, help='ID del instructor')
+        parser.add_argument('--output', help='Fichero de salida; por defecto, la salida estándar')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as exc:
+            raise CommandError(f'Fecha no válida: {exc}')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor que cero')
+        lines = stream_export(
+            options['dataset'], options['export_format'], since=since, until=until,
+            instructor_id=options['instructor'], chunk_size=options['chunk_size'],
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        rows = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+                rows += 1
+        if options['export_format'] == 'csv':
+            rows -= 1
+        self.stdout.write(self.style.SUCCESS(f'Filas exportadas: {rows} en {options["output"]}'))
@@ -0,0 +1,59 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from payments.models import Order
+from payments.webhooks import build_fake_event, sign_payload
+
+
+class Command(BaseCommand):
+    help = 'Enviar eventos de Stripe simulados y firmados al webhook (pruebas sin conexión)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100, help='Número de órdenes pendientes a pagar')
+        parser.add_argument('--duplicates', type=int, default=0, help='Reenvíos de cada evento para probar la deduplicación')
+        parser.add_argument('--url', help='URL del webhook de un servidor en marcha; por defecto se usa un cliente interno')
+
+    def handle(self, *args, **options):
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        if not secret:
+            raise CommandError('Define STRIPE_WEBHOOK_SECRET para firmar los eventos')
+
+        orders = Order.objects.filter(status='pending').order_by('created_at')[:options['orders']]
+        client = Client(HTTP_HOST='localhost')
+        url = options['url'] or reverse('stripe_webhook')
+
+        sent = failed = 0
+        started = time.perf_counter()
+        for order in orders:
+            payload = json.dumps(build_fake_event(order))
+            for _ in range(1 + options['duplicates']):
+                status = self.send(client, url, payload, sign_payload(payload, secret), options['url'])
+                sent += 1
+                failed += status != 200
+        elapsed = time.perf_counter() - started
+
+        rate = sent / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Eventos enviados: {sent} ({failed} con error) en {elapsed:.2f}s, {rate:.0f} eventos/s'
+        ))
+
+    def send(self, client, url, payload, signature, remote):
+        if not remote:
+            return client.post(url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature).status_code
+        request = urllib.request.Request(
+            url,
+            data=payload.encode(),
+            headers={'Content-Type': 'application/json', 'Stripe-Signature': signature},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
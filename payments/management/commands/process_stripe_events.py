@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from payments.webhooks import WEBHOOK_BATCH_SIZE, process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Procesar los eventos pendientes de la bandeja de webhooks de Stripe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=WEBHOOK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_pending_events(options['batch_size'])
+            total += processed
+            if processed < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Eventos procesados: {total}'))
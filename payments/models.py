@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
-from cursos.models import Course
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from cursos.models import Course, final_price_expression
 
 class Payment(models.Model):
     """
@@ -37,10 +39,29 @@ class Payment(models.Model):
         verbose_name = 'Pago'
         verbose_name_plural = 'Pagos'
         ordering = ['-created_at']
+        # Búsqueda por Payment Intent (confirmación y webhooks) y rangos de los agregados diarios
+        indexes = [
+            models.Index(fields=['stripe_payment_intent_id'], name='payments_intent_idx'),
+            models.Index(fields=['status', 'completed_at'], name='payments_status_done_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.full_name} - {self.course.title} - ${self.amount}"
 
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Anota el número de items y el total (con descuentos) calculados en SQL
+        """
+        return self.annotate(
+            items_count=models.Count('items'),
+            items_total=Coalesce(
+                models.Sum(final_price_expression('items__course__')),
+                Value(0),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
 class Cart(models.Model):
     """
     Carrito de compras
@@ -49,6 +70,8 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CartQuerySet.as_manager()
+    
     class Meta:
         db_table = 'carts'
         verbose_name = 'Carrito'
@@ -57,13 +80,20 @@ class Cart(models.Model):
     def __str__(self):
         return f"Carrito de {self.user.full_name}"
     
+    def _totals(self):
+        if not hasattr(self, 'items_total'):
+            totals = Cart.objects.with_totals().filter(pk=self.pk).values('items_count', 'items_total').first() or {}
+            self.items_count = totals.get('items_count', 0)
+            self.items_total = totals.get('items_total', 0)
+        return self.items_count, self.items_total
+    
     @property
     def total_amount(self):
-        return sum(item.course.final_price for item in self.items.all())
+        return self._totals()[1]
     
     @property
     def total_items(self):
-        return self.items.count()
+        return self._totals()[0]
 
 class CartItem(models.Model):
     """
@@ -137,6 +167,8 @@ class Order(models.Model):
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, blank=True, null=True)
+    # Huella del carrito del que salió la orden (ver payments/orders.py)
+    cart_signature = models.CharField(max_length=40, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
     
@@ -145,16 +177,37 @@ class Order(models.Model):
         verbose_name = 'Orden'
         verbose_name_plural = 'Órdenes'
         ordering = ['-created_at']
+        # Órdenes del usuario (todas o por estado) por fecha y rangos de los agregados diarios
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='orders_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at'], name='orders_user_status_idx'),
+            models.Index(fields=['status', 'completed_at'], name='orders_status_done_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import uuid
-            self.order_number = str(uuid.uuid4())[:8].upper()
+            from .numbering import allocate_order_number
+            self.order_number = allocate_order_number()
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"Orden {self.order_number} - {self.user.full_name}"
 
+class NumberSequence(models.Model):
+    """
+    Secuencias hi-lo: cada proceso reserva bloques de números consecutivos
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_block = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'number_sequences'
+        verbose_name = 'Secuencia'
+        verbose_name_plural = 'Secuencias'
+    
+    def __str__(self):
+        return f"{self.name} ({self.next_block})"
+
 class OrderItem(models.Model):
     """
     Items de la orden
@@ -170,3 +223,49 @@ class OrderItem(models.Model):
     
     def __str__(self):
         return f"{self.order.order_number} - {self.course.title}"
+
+class CouponRedemption(models.Model):
+    """
+    Registro de cada uso de un cupón; una orden solo puede canjear un cupón
+    """
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='redemptions')
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='coupon_redemption')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='coupon_redemptions')
+    discount_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'coupon_redemptions'
+        verbose_name = 'Canje de Cupón'
+        verbose_name_plural = 'Canjes de Cupones'
+    
+    def __str__(self):
+        return f"{self.coupon_id} - Orden {self.order_id}"
+
+class StripeEvent(models.Model):
+    """
+    Bandeja de entrada de eventos de webhook de Stripe
+    """
+    EVENT_STATUS = [
+        ('pending', 'Pendiente'),
+        ('processed', 'Procesado'),
+        ('failed', 'Fallido'),
+    ]
+    
+    event_id = models.CharField(max_length=100, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=EVENT_STATUS, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'stripe_events'
+        verbose_name = 'Evento de Stripe'
+        verbose_name_plural = 'Eventos de Stripe'
+        ordering = ['received_at']
+    
+    def __str__(self):
+        return f"{self.event_type} - {self.event_id}"
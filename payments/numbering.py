@@ -0,0 +1,147 @@
+"""
+Asignación de números de orden con el esquema hi-lo.
+
+Cada proceso reserva en la base de datos un bloque de números consecutivos
+(una sola escritura por bloque) y los reparte desde memoria. Los números se
+muestran en base 32 de Crockford (sin I, L, O ni U) con un prefijo.
+
+En PostgreSQL los bloques salen de una secuencia (nextval no se deshace con
+la transacción). En el resto de motores se incrementa la fila de
+NumberSequence con la conexión en curso: una segunda conexión no podría
+escribir en SQLite mientras la transacción de la petición tiene el bloqueo.
+Si la reserva se hace dentro de una transacción, del bloque sale solo ese
+número hasta que la transacción se confirma (on_commit): si se deshace, o se
+deshace el savepoint de la reserva, Django descarta el on_commit y el bloque
+no se vuelve a usar, porque otro proceso podría reservarlo de nuevo.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+from .models import NumberSequence
+
+ORDER_NUMBER_PREFIX = getattr(settings, 'ORDER_NUMBER_PREFIX', 'CM')
+ORDER_NUMBER_BLOCK_SIZE = getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 100)
+ORDER_NUMBER_WIDTH = 7
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+def encode_base32(number, width=ORDER_NUMBER_WIDTH):
+    digits = []
+    while number:
+        number, remainder = divmod(number, 32)
+        digits.append(CROCKFORD_ALPHABET[remainder])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+def sequence_name(name):
+    return f'{NumberSequence._meta.db_table}_{name}'
+
+
+def ensure_sequence(name, using=DEFAULT_DB_ALIAS):
+    """
+    Crea la secuencia de PostgreSQL, continuando donde lo dejó la tabla
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    start = NumberSequence.objects.using(using).filter(name=name).values_list('next_block', flat=True).first() or 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS {connection.ops.quote_name(sequence_name(name))} MINVALUE 0 START WITH {int(start)}'
+        )
+
+
+def reserve_block(name, using=DEFAULT_DB_ALIAS):
+    """
+    Reserva el siguiente bloque de la secuencia con la conexión en curso.
+
+    Devuelve (bloque, definitivo). definitivo es False si la reserva forma
+    parte de una transacción abierta y se desharía con ella.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [sequence_name(name)])
+            return cursor.fetchone()[0], True
+
+    durable = not connection.in_atomic_block
+    table = NumberSequence._meta.db_table
+    for _ in range(3):
+        try:
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(f'UPDATE {table} SET next_block = next_block + 1 WHERE name = %s', [name])
+                if cursor.rowcount:
+                    cursor.execute(f'SELECT next_block FROM {table} WHERE name = %s', [name])
+                    return cursor.fetchone()[0] - 1, durable
+                cursor.execute(f'INSERT INTO {table} (name, next_block) VALUES (%s, 1)', [name])
+                return 0, durable
+        except IntegrityError:
+            # Otro proceso creó la secuencia a la vez: reintentar
+            continue
+    raise RuntimeError(f'No se pudo reservar un bloque de la secuencia {name}')
+
+
+class _PendingBlock:
+    """
+    Bloque reservado dentro de una transacción que aún no se ha confirmado
+    """
+
+    def __init__(self):
+        self.committed = False
+
+    def confirm(self):
+        self.committed = True
+
+
+class HiLoAllocator:
+    """
+    Reparte números de una secuencia reservando bloques de `block_size`
+    """
+
+    def __init__(self, name, block_size, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.block_size = block_size
+        self.using = using
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._next = 0
+        self._limit = 0
+        self._pending = None
+
+    def allocate(self):
+        with self._lock:
+            # Tras un fork (gunicorn --preload) el bloque no puede compartirse
+            if self._pid != os.getpid():
+                self._reset()
+            if self._pending is not None:
+                if self._pending.committed:
+                    self._pending = None
+                else:
+                    # Sin confirmar (transacción abierta o deshecha): se reserva otro bloque
+                    self._reset()
+            if self._next >= self._limit:
+                block, durable = reserve_block(self.name, self.using)
+                self._next = block * self.block_size
+                self._limit = self._next + self.block_size
+                if not durable:
+                    self._pending = _PendingBlock()
+                    transaction.on_commit(self._pending.confirm, using=self.using)
+            number = self._next
+            self._next += 1
+            return number
+
+
+_order_numbers = HiLoAllocator('order_number', ORDER_NUMBER_BLOCK_SIZE)
+
+
+def allocate_order_number():
+    """
+    Número de orden corto y legible, p. ej. CM00001A7
+    """
+    return f'{ORDER_NUMBER_PREFIX}{encode_base32(_order_numbers.allocate())}'
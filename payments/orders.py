@@ -0,0 +1,61 @@
+"""
+Construcción de órdenes a partir del carrito.
+"""
+import hashlib
+
+from django.db import transaction
+
+from cursos.models import final_price_expression
+from .models import CartItem, Order, OrderItem
+
+
+def get_cart_lines(cart):
+    """
+    Pares (course_id, precio final) del carrito en una sola consulta
+    """
+    return list(
+        CartItem.objects.filter(cart=cart)
+        .order_by('course_id')
+        .values_list('course_id', final_price_expression('course__'))
+    )
+
+
+def get_cart_signature(lines):
+    """
+    Huella del contenido del carrito para reconocer órdenes ya creadas
+    """
+    payload = ';'.join(f'{course_id}:{price}' for course_id, price in sorted(lines))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def build_order_from_cart(cart):
+    """
+    Devuelve (orden, creada). Reutiliza la orden pendiente del usuario si el
+    carrito no ha cambiado; si no, crea la orden y sus items en una transacción.
+    Devuelve (None, False) si el carrito está vacío.
+    """
+    lines = get_cart_lines(cart)
+    if not lines:
+        return None, False
+    signature = get_cart_signature(lines)
+    order = (
+        Order.objects.filter(user_id=cart.user_id, status='pending', cart_signature=signature)
+        .order_by('-created_at')
+        .first()
+    )
+    if order is not None:
+        return order, False
+
+    # Mismo total que Cart.objects.with_totals(), sin otra consulta
+    subtotal = sum(price for _, price in lines)
+    with transaction.atomic():
+        order = Order.objects.create(
+            user_id=cart.user_id,
+            subtotal=subtotal,
+            total_amount=subtotal,
+            cart_signature=signature,
+        )
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, course_id=course_id, price=price) for course_id, price in lines]
+        )
+    return order, True
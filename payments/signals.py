@@ -0,0 +1,48 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from cursos.rollups import mark_days_dirty
+from .cart_store import merge_anonymous_cart
+from .coupons import invalidate_coupon
+from .models import Coupon, Order, Payment
+
+
+def ensure_order_number_sequence(sender, using='default', **kwargs):
+    """
+    Crea la secuencia de números de orden (PostgreSQL) tras aplicar las migraciones
+    """
+    from .numbering import ensure_sequence
+
+    ensure_sequence('order_number', using=using)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def refresh_coupon_cache(sender, instance, **kwargs):
+    """
+    Descarta la validez cacheada del cupón modificado
+    """
+    invalidate_coupon(instance.code)
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """
+    Une el carrito anónimo de la sesión al carrito del usuario
+    """
+    if request is not None and hasattr(request, 'session'):
+        merge_anonymous_cart(request, user)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Order)
+def mark_sales_stats_dirty(sender, instance, **kwargs):
+    """
+    Un reembolso o cancelación posterior cambia los agregados de su día
+    """
+    # Las altas caen en la ventana que recalcula la tarea periódica
+    if not kwargs.get('created', False):
+        mark_days_dirty(instance.completed_at)
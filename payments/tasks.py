@@ -0,0 +1,31 @@
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def fulfill_order_task(self, order_id, payment_intent_id):
+    """
+    Verifica el Payment Intent y completa la orden fuera de la petición
+    """
+    import stripe
+    from .fulfillment import confirm_and_fulfill
+
+    try:
+        return confirm_and_fulfill(order_id, payment_intent_id)
+    except stripe.error.APIConnectionError as exc:
+        raise self.retry(exc=exc)
+
+
+@shared_task
+def process_stripe_events_task(max_batches=10):
+    """
+    Procesa la bandeja de eventos de Stripe en lotes
+    """
+    from .webhooks import WEBHOOK_BATCH_SIZE, process_pending_events
+
+    total = 0
+    for _ in range(max_batches):
+        processed = process_pending_events(WEBHOOK_BATCH_SIZE)
+        total += processed
+        if processed < WEBHOOK_BATCH_SIZE:
+            break
+    return total
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from cursos.models import Category, Course, Enrollment
+from .cart_store import CART_SESSION_COURSES_KEY, DatabaseCartStore, check_cart_store, get_user_cart_store
+from .coupons import CouponError, redeem_coupon
+from .exports import stream_export
+from .fulfillment import fulfill_order
+from .models import Cart, CartItem, Coupon, CouponRedemption, NumberSequence, Order, OrderItem, Payment, StripeEvent
+from .numbering import _order_numbers
+from .orders import build_order_from_cart
+from .webhooks import build_fake_event, process_pending_events, sign_payload
+
+User = get_user_model()
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='clave-segura',
+        first_name=username.capitalize(), last_name='Prueba', **extra,
+    )
+
+
+def create_course(instructor, category, slug, **extra):
+    fields = {
+        'title': slug.replace('-', ' ').capitalize(), 'description': 'Curso', 'short_description': 'Curso',
+        'price': Decimal('10'), 'status': 'published', 'duration_hours': 1, 'requirements': 'Ninguno',
+        'what_you_learn': 'Lo básico', **extra,
+    }
+    return Course.objects.create(slug=slug, category=category, instructor=instructor, **fields)
+
+
+class OrderNumberTests(TestCase):
+    """
+    Los números de orden se reservan con la conexión en curso, también
+    dentro de una transacción
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('comprador')
+
+    def setUp(self):
+        # Cada test deshace su transacción: no vale un bloque confirmado en otro
+        _order_numbers._reset()
+
+    def create_order(self):
+        return Order.objects.create(user=self.user, subtotal=Decimal('10'), total_amount=Decimal('10'))
+
+    def test_create_order_inside_atomic(self):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            first = self.create_order()
+            second = self.create_order()
+        self.assertNotEqual(first.order_number, second.order_number)
+        # Confirmada la transacción, el último bloque sigue repartiendo números
+        third = self.create_order()
+        self.assertNotIn(third.order_number, (first.order_number, second.order_number))
+        self.assertEqual(NumberSequence.objects.get(name='order_number').next_block, 2)
+
+    def test_block_from_rolled_back_savepoint_is_discarded(self):
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    discarded = self.create_order()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            kept = self.create_order()
+        self.assertEqual(kept.order_number, discarded.order_number)
+        self.assertEqual(Order.objects.filter(order_number=kept.order_number).count(), 1)
+
+    def test_rolled_back_block_is_not_reused_from_memory(self):
+        try:
+            with transaction.atomic():
+                discarded = self.create_order()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        # El bloque volvió a quedar libre: se reserva de nuevo y no hay duplicados
+        order = self.create_order()
+        self.assertEqual(order.order_number, discarded.order_number)
+        self.assertEqual(Order.objects.filter(order_number=order.order_number).count(), 1)
+        self.assertEqual(NumberSequence.objects.get(name='order_number').next_block, 1)
+
+    def test_admin_add_view(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='clave-segura',
+            first_name='Admin', last_name='Sitio',
+        )
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:payments_order_add'), {
+            'user': self.user.pk,
+            'status': 'pending',
+            'subtotal': '25.00',
+            'discount_amount': '0',
+            'total_amount': '25.00',
+            'items-TOTAL_FORMS': '0',
+            'items-INITIAL_FORMS': '0',
+            'items-MIN_NUM_FORMS': '0',
+            'items-MAX_NUM_FORMS': '1000',
+        })
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get(user=self.user)
+        self.assertTrue(order.order_number)
+
+
+class CartStoreTests(TestCase):
+    """
+    Sin caché compartida el carrito no vive en la caché local de cada worker
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('comprador')
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.course = create_course(instructor, category, 'django')
+
+    def test_local_cache_stores_user_cart_in_database(self):
+        self.assertIsInstance(get_user_cart_store(self.user.pk), DatabaseCartStore)
+
+    @override_settings(CART_STORE='payments.cart_store.CacheCartStore')
+    def test_cache_store_refused_with_local_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_cart_store()
+
+    def test_anonymous_cart_in_session_is_merged_on_login(self):
+        response = self.client.post(
+            reverse('add_to_cart'), {'course_id': self.course.pk}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session[CART_SESSION_COURSES_KEY], [self.course.pk])
+        self.client.login(email='comprador@example.com', password='clave-segura')
+        self.assertEqual(get_user_cart_store(self.user.pk).course_ids(), [self.course.pk])
+
+    def test_anonymous_visitor_views_and_edits_cart(self):
+        self.client.post(reverse('add_to_cart'), {'course_id': self.course.pk}, content_type='application/json')
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cart'].total_items, 1)
+        response = self.client.post(
+            reverse('remove_from_cart'), {'course_id': self.course.pk}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session[CART_SESSION_COURSES_KEY], [])
+
+
+class ExportTests(TestCase):
+    """
+    Un instructor solo exporta las líneas de sus cursos; las filas se leen
+    por bloques
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        buyer = create_user('comprador')
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.instructors = [create_user(f'profesor{number}', is_instructor=True) for number in range(2)]
+        courses = [
+            create_course(instructor, category, f'curso-{number}') for number, instructor in enumerate(cls.instructors)
+        ]
+        # Una orden con cursos de los dos instructores
+        order = Order.objects.create(user=buyer, subtotal=Decimal('20'), total_amount=Decimal('20'))
+        for course in courses:
+            OrderItem.objects.create(order=order, course=course, price=Decimal('10'))
+        cls.courses = courses
+
+    def export(self, dataset, **kwargs):
+        return list(stream_export(dataset, 'jsonl', **kwargs))
+
+    def test_instructor_orders_only_include_own_items(self):
+        lines = self.export('orders', instructor_id=self.instructors[0].pk)
+        self.assertEqual(len(lines), 1)
+        self.assertIn(f'"course_id": {self.courses[0].pk}', lines[0])
+        self.assertNotIn('total_amount', lines[0])
+
+    def test_rows_are_read_in_keyset_chunks(self):
+        with self.assertNumQueries(3):
+            lines = self.export('order_items', chunk_size=1)
+        self.assertEqual(len(lines), 2)
+
+
+class BuildOrderTests(TestCase):
+    """
+    El checkout reutiliza la orden pendiente mientras el carrito no cambie
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('comprador')
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.courses = [
+            create_course(instructor, category, 'django', price=Decimal('30'), discount_price=Decimal('20')),
+            create_course(instructor, category, 'python', price=Decimal('15')),
+            create_course(instructor, category, 'sql', price=Decimal('12')),
+        ]
+
+    def setUp(self):
+        self.cart = Cart.objects.create(user=self.user)
+        for course in self.courses[:2]:
+            CartItem.objects.create(cart=self.cart, course=course)
+
+    def test_unchanged_cart_reuses_pending_order(self):
+        order, created = build_order_from_cart(self.cart)
+        self.assertTrue(created)
+        self.assertEqual(order.total_amount, Decimal('35'))
+        self.assertEqual(
+            sorted(order.items.values_list('course_id', 'price')),
+            [(self.courses[0].pk, Decimal('20')), (self.courses[1].pk, Decimal('15'))],
+        )
+        with self.assertNumQueries(2):
+            again, created = build_order_from_cart(self.cart)
+        self.assertFalse(created)
+        self.assertEqual(again, order)
+
+    def test_changed_cart_or_price_builds_new_order(self):
+        order, created = build_order_from_cart(self.cart)
+        CartItem.objects.create(cart=self.cart, course=self.courses[2])
+        bigger, created = build_order_from_cart(self.cart)
+        self.assertTrue(created)
+        self.assertNotEqual(bigger, order)
+        Course.objects.filter(pk=self.courses[1].pk).update(discount_price=Decimal('10'))
+        cheaper, created = build_order_from_cart(self.cart)
+        self.assertTrue(created)
+        self.assertEqual(cheaper.total_amount, Decimal('42'))
+
+    def test_empty_cart_builds_nothing(self):
+        CartItem.objects.filter(cart=self.cart).delete()
+        self.assertEqual(build_order_from_cart(self.cart), (None, False))
+
+
+class FulfillOrderTests(TestCase):
+    """
+    Cumplir una orden es idempotente por Payment Intent
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('comprador')
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.courses = [create_course(instructor, category, slug) for slug in ('django', 'python')]
+
+    def setUp(self):
+        cart = Cart.objects.create(user=self.user)
+        for course in self.courses:
+            CartItem.objects.create(cart=cart, course=course)
+        self.order, created = build_order_from_cart(cart)
+
+    def test_repeated_payment_intent_is_fulfilled_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(fulfill_order(self.order.pk, 'pi_prueba'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(fulfill_order(self.order.pk, 'pi_prueba'))
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'completed')
+        self.assertEqual(Payment.objects.filter(stripe_payment_intent_id='pi_prueba').count(), 2)
+        self.assertEqual(Enrollment.objects.filter(student=self.user).count(), 2)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+
+    def test_payment_intent_is_not_reused_for_another_order(self):
+        fulfill_order(self.order.pk, 'pi_prueba')
+        other = Order.objects.create(user=self.user, subtotal=Decimal('10'), total_amount=Decimal('10'))
+        OrderItem.objects.create(order=other, course=self.courses[0], price=Decimal('10'))
+        self.assertFalse(fulfill_order(other.pk, 'pi_prueba'))
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'pending')
+        self.assertEqual(Payment.objects.count(), 2)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_prueba')
+class StripeWebhookTests(TestCase):
+    """
+    El webhook verifica la firma y guarda cada evento una sola vez
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = create_user('comprador')
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        course = create_course(instructor, category, 'django')
+        cls.order = Order.objects.create(user=user, subtotal=Decimal('10'), total_amount=Decimal('10'))
+        OrderItem.objects.create(order=cls.order, course=course, price=Decimal('10'))
+
+    def post_event(self, payload, secret='whsec_prueba'):
+        return self.client.post(
+            reverse('stripe_webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign_payload(payload, secret),
+        )
+
+    def test_bad_signature_is_rejected(self):
+        response = self.post_event(json.dumps(build_fake_event(self.order)), secret='whsec_otro')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_duplicate_event_is_stored_and_processed_once(self):
+        payload = json.dumps(build_fake_event(self.order))
+        self.assertEqual(self.post_event(payload).status_code, 200)
+        self.assertEqual(self.post_event(payload).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        self.assertEqual(process_pending_events(), 1)
+        self.assertEqual(process_pending_events(), 0)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'completed')
+        self.assertEqual(StripeEvent.objects.get().status, 'processed')
+
+
+class RedeemCouponTests(TestCase):
+    """
+    Un cupón no supera su límite de usos ni se canjea dos veces en una orden
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('comprador')
+        now = timezone.now()
+        cls.coupon = Coupon.objects.create(
+            code='UNAVEZ', description='Un solo uso', discount_type='percentage', discount_value=Decimal('25'),
+            usage_limit=1, valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def create_order(self):
+        return Order.objects.create(user=self.user, subtotal=Decimal('40'), total_amount=Decimal('40'))
+
+    def test_usage_limit(self):
+        first = self.create_order()
+        self.assertEqual(redeem_coupon('UNAVEZ', first), Decimal('10.00'))
+        first.refresh_from_db()
+        self.assertEqual(first.total_amount, Decimal('30.00'))
+        with self.assertRaises(CouponError):
+            redeem_coupon('UNAVEZ', self.create_order())
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+    def test_double_redemption_on_the_same_order(self):
+        self.coupon.usage_limit = None
+        self.coupon.save()
+        order = self.create_order()
+        stale = Order.objects.get(pk=order.pk)
+        redeem_coupon('UNAVEZ', order)
+        # Segunda petición con la orden leída antes del primer canje
+        with self.assertRaises(CouponError):
+            redeem_coupon('UNAVEZ', stale)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertEqual(CouponRedemption.objects.filter(order=order).count(), 1)
+
+
+class CartTotalsTests(TestCase):
+    """
+    Los totales calculados en SQL coinciden con Course.final_price
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        instructor = create_user('profesor', is_instructor=True)
+        category = Category.objects.create(name='Programación', slug='programacion')
+        cls.courses = [
+            create_course(instructor, category, 'sin-descuento', price=Decimal('30')),
+            create_course(instructor, category, 'con-descuento', price=Decimal('30'), discount_price=Decimal('19.99')),
+            # Un descuento de 0 no cuenta: se cobra el precio
+            create_course(instructor, category, 'descuento-cero', price=Decimal('12.50'), discount_price=Decimal('0')),
+        ]
+        cls.full_cart = Cart.objects.create(user=create_user('comprador'))
+        for course in cls.courses:
+            CartItem.objects.create(cart=cls.full_cart, course=course)
+        cls.empty_cart = Cart.objects.create(user=create_user('curioso'))
+
+    def test_with_totals_matches_final_price(self):
+        carts = {cart.pk: cart for cart in Cart.objects.with_totals()}
+        full = carts[self.full_cart.pk]
+        self.assertEqual(full.items_count, 3)
+        self.assertEqual(full.items_total, sum(course.final_price for course in self.courses))
+        self.assertEqual(full.items_total, Decimal('62.49'))
+        self.assertEqual((carts[self.empty_cart.pk].items_count, carts[self.empty_cart.pk].items_total), (0, 0))
+
+    def test_properties_use_annotation_when_present(self):
+        cart = Cart.objects.with_totals().get(pk=self.full_cart.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual((cart.total_items, cart.total_amount), (3, Decimal('62.49')))
+        cart = Cart.objects.get(pk=self.full_cart.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual((cart.total_items, cart.total_amount), (3, Decimal('62.49')))
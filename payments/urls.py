@@ -10,4 +10,6 @@ urlpatterns = [
     path('api/create-payment-intent/', views.create_payment_intent, name='create_payment_intent'),
     path('api/confirm-payment/', views.confirm_payment, name='confirm_payment'),
     path('api/apply-coupon/', views.apply_coupon, name='apply_coupon'),
+    path('webhooks/stripe/', views.stripe_webhook, name='stripe_webhook'),
+    path('exportar/<str:dataset>/', views.export_data, name='export_data'),
 ]
\ No newline at end of file
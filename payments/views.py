@@ -1,33 +1,39 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from .models import Cart, CartItem, Payment, Order, OrderItem, Coupon
-from cursos.models import Course, Enrollment
+from django.db.models import Prefetch
+from .models import Order, OrderItem
+from cursos.models import Course
+from .orders import build_order_from_cart
+from .cart_store import get_cart_contents, get_cart_store, persist_cart
+from .fulfillment import PaymentNotSucceeded, confirm_and_fulfill
+from .tasks import fulfill_order_task
+from .webhooks import receive_event
+from .coupons import CouponError, redeem_coupon
+from .exports import EXPORTS, EXPORT_FORMATS, export_filename, stream_export
 import stripe
 import json
+from datetime import date
 from decimal import Decimal
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
-@login_required
 def cart_view(request):
     """
     Vista del carrito de compras
     """
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = cart.items.all()
+    cart = get_cart_contents(get_cart_store(request))
     
     context = {
         'cart': cart,
-        'cart_items': cart_items,
+        'cart_items': cart.items,
         'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
     }
     return render(request, 'payments/cart.html', context)
 
-@login_required
 @csrf_exempt
 def remove_from_cart(request):
     """
@@ -37,15 +43,15 @@ def remove_from_cart(request):
         data = json.loads(request.body)
         course_id = data.get('course_id')
         
+        cart = get_cart_store(request)
         try:
-            cart = Cart.objects.get(user=request.user)
-            cart_item = CartItem.objects.get(cart=cart, course_id=course_id)
-            cart_item.delete()
-            
-            return JsonResponse({'success': True, 'message': 'Curso removido del carrito'})
-            
-        except (Cart.DoesNotExist, CartItem.DoesNotExist):
+            removed = cart is not None and cart.remove(int(course_id))
+        except (TypeError, ValueError):
+            removed = False
+        if not removed:
             return JsonResponse({'error': 'Item no encontrado en el carrito'}, status=404)
+        
+        return JsonResponse({'success': True, 'message': 'Curso removido del carrito'})
     
     return JsonResponse({'error': 'Método no permitido'}, status=405)
 
@@ -54,28 +60,15 @@ def checkout(request):
     """
     Proceso de checkout
     """
-    cart = get_object_or_404(Cart, user=request.user)
-    cart_items = cart.items.all()
+    # El carrito se guarda en la base de datos solo al llegar aquí
+    cart = persist_cart(request.user.pk)
     
-    if not cart_items.exists():
+    # Crear la orden (o reutilizar la pendiente si el carrito no cambió)
+    order, created = build_order_from_cart(cart)
+    if order is None:
         messages.warning(request, 'Tu carrito está vacío')
         return redirect('cart')
     
-    # Crear orden
-    order = Order.objects.create(
-        user=request.user,
-        subtotal=cart.total_amount,
-        total_amount=cart.total_amount
-    )
-    
-    # Crear items de la orden
-    for cart_item in cart_items:
-        OrderItem.objects.create(
-            order=order,
-            course=cart_item.course,
-            price=cart_item.course.final_price
-        )
-    
     context = {
         'order': order,
         'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
@@ -130,44 +123,25 @@ def confirm_payment(request):
         try:
             order = Order.objects.get(id=order_id, user=request.user)
             
-            # Verificar payment intent con Stripe
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
-            
-            if intent.status == 'succeeded':
-                # Crear registro de pago
-                for order_item in order.items.all():
-                    Payment.objects.create(
-                        user=request.user,
-                        course=order_item.course,
-                        payment_method='stripe',
-                        amount=order_item.price,
-                        status='completed',
-                        stripe_payment_intent_id=payment_intent_id
-                    )
-                    
-                    # Crear inscripción
-                    Enrollment.objects.get_or_create(
-                        student=request.user,
-                        course=order_item.course
-                    )
-                
-                # Actualizar orden
-                order.status = 'completed'
-                order.save()
-                
-                # Limpiar carrito
-                cart = Cart.objects.get(user=request.user)
-                cart.items.all().delete()
-                
+            if settings.PAYMENT_FULFILLMENT_ASYNC:
+                # Verificación con Stripe y cumplimiento en un worker de Celery
+                fulfill_order_task.delay(order.id, payment_intent_id)
                 return JsonResponse({
                     'success': True,
-                    'message': 'Pago procesado correctamente'
+                    'pending': True,
+                    'message': 'Pago recibido, estamos procesando tu inscripción'
                 })
-            else:
-                return JsonResponse({'error': 'Pago no completado'}, status=400)
+            
+            confirm_and_fulfill(order.id, payment_intent_id)
+            return JsonResponse({
+                'success': True,
+                'message': 'Pago procesado correctamente'
+            })
                 
         except Order.DoesNotExist:
             return JsonResponse({'error': 'Orden no encontrada'}, status=404)
+        except PaymentNotSucceeded:
+            return JsonResponse({'error': 'Pago no completado'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
     
@@ -190,7 +164,9 @@ def my_orders(request):
     """
     Órdenes del usuario
     """
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = Order.objects.filter(user=request.user).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('course__category'))
+    ).order_by('-created_at')
     
     context = {
         'orders': orders,
@@ -209,32 +185,8 @@ def apply_coupon(request):
         order_id = data.get('order_id')
         
         try:
-            coupon = Coupon.objects.get(code=coupon_code)
             order = Order.objects.get(id=order_id, user=request.user)
-            
-            if not coupon.is_valid():
-                return JsonResponse({'error': 'Cupón no válido o expirado'}, status=400)
-            
-            if order.subtotal < coupon.minimum_amount:
-                return JsonResponse({
-                    'error': f'El monto mínimo para este cupón es ${coupon.minimum_amount}'
-                }, status=400)
-            
-            # Calcular descuento
-            if coupon.discount_type == 'percentage':
-                discount = order.subtotal * (coupon.discount_value / 100)
-            else:
-                discount = coupon.discount_value
-            
-            # Actualizar orden
-            order.coupon = coupon
-            order.discount_amount = discount
-            order.total_amount = order.subtotal - discount
-            order.save()
-            
-            # Incrementar uso del cupón
-            coupon.used_count += 1
-            coupon.save()
+            discount = redeem_coupon(coupon_code or '', order)
             
             return JsonResponse({
                 'success': True,
@@ -242,9 +194,53 @@ def apply_coupon(request):
                 'total_amount': float(order.total_amount)
             })
             
-        except Coupon.DoesNotExist:
-            return JsonResponse({'error': 'Cupón no encontrado'}, status=404)
+        except CouponError as e:
+            return JsonResponse({'error': e.message}, status=e.status)
         except Order.DoesNotExist:
             return JsonResponse({'error': 'Orden no encontrada'}, status=404)
     
     return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+
+@csrf_exempt
+def stripe_webhook(request):
+    """
+    Webhook de Stripe: guarda el evento firmado en la bandeja y responde al momento
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+    try:
+        receive_event(request.body.decode('utf-8'), request.META.get('HTTP_STRIPE_SIGNATURE', ''))
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return HttpResponse(status=400)
+    return HttpResponse(status=200)
+
+
+@login_required
+def export_data(request, dataset):
+    """
+    Exportación en streaming (CSV o JSONL) para finanzas e instructores
+    """
+    if not (request.user.is_staff or getattr(request.user, 'is_instructor', False)):
+        return redirect('home')
+    if dataset not in EXPORTS:
+        return HttpResponse('Conjunto de datos desconocido', status=404)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse('Formato no válido', status=400)
+    try:
+        since = date.fromisoformat(request.GET['since']) if request.GET.get('since') else None
+        until = date.fromisoformat(request.GET['until']) if request.GET.get('until') else None
+        instructor_id = int(request.GET['instructor']) if request.GET.get('instructor') else None
+    except ValueError:
+        return HttpResponse('Filtros no válidos', status=400)
+    # Los instructores solo exportan datos de sus propios cursos
+    if not request.user.is_staff:
+        instructor_id = request.user.pk
+
+    response = StreamingHttpResponse(
+        stream_export(dataset, export_format, since=since, until=until, instructor_id=instructor_id),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(dataset, export_format)}"'
+    return response
@@ -0,0 +1,107 @@
+"""
+Ingesta de webhooks de Stripe a través de una bandeja de entrada.
+
+La vista solo verifica la firma y guarda el evento (deduplicado por ID);
+los workers de Celery procesan la bandeja en lotes.
+"""
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .fulfillment import fulfill_order
+from .models import StripeEvent
+
+WEBHOOK_BATCH_SIZE = getattr(settings, 'STRIPE_WEBHOOK_BATCH_SIZE', 100)
+WEBHOOK_MAX_ATTEMPTS = getattr(settings, 'STRIPE_WEBHOOK_MAX_ATTEMPTS', 5)
+
+
+def receive_event(payload, signature):
+    """
+    Verifica la firma y guarda el evento en la bandeja (los duplicados se ignoran)
+    """
+    event = stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event['id'], event_type=event['type'], payload=json.loads(payload))],
+        ignore_conflicts=True,
+    )
+    return event
+
+
+def handle_payment_intent_succeeded(event):
+    intent = event['data']['object']
+    order_id = (intent.get('metadata') or {}).get('order_id')
+    if order_id:
+        fulfill_order(int(order_id), intent['id'])
+
+
+EVENT_HANDLERS = {
+    'payment_intent.succeeded': handle_payment_intent_succeeded,
+}
+
+
+def process_pending_events(batch_size=WEBHOOK_BATCH_SIZE):
+    """
+    Procesa un lote de eventos pendientes. Devuelve cuántos se procesaron.
+    """
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('received_at')[:batch_size]
+        )
+        for event in events:
+            handler = EVENT_HANDLERS.get(event.event_type)
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    if handler:
+                        handler(event.payload)
+            except Exception as exc:
+                event.last_error = str(exc)
+                if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                    event.status = 'failed'
+            else:
+                event.status = 'processed'
+                event.processed_at = timezone.now()
+                event.last_error = ''
+        StripeEvent.objects.bulk_update(events, ['status', 'attempts', 'last_error', 'processed_at'])
+    return len(events)
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """
+    Cabecera Stripe-Signature para un payload, con el mismo esquema que Stripe
+    """
+    timestamp = timestamp or int(time.time())
+    signed = f'{timestamp}.{payload}'.encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def build_fake_event(order, event_type='payment_intent.succeeded'):
+    """
+    Evento de Stripe simulado para una orden, para pruebas sin conexión
+    """
+    return {
+        'id': f'evt_fake_{uuid.uuid4().hex}',
+        'object': 'event',
+        'type': event_type,
+        'created': int(time.time()),
+        'data': {
+            'object': {
+                'id': f'pi_fake_{uuid.uuid4().hex[:24]}',
+                'object': 'payment_intent',
+                'amount': int(order.total_amount * 100),
+                'currency': 'usd',
+                'status': 'succeeded',
+                'metadata': {'order_id': str(order.id), 'user_id': str(order.user_id)},
+            }
+        },
+    }